@@ -5,10 +5,18 @@ Provides REST API endpoints for the React frontend
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import functools
+import json
+import logging
 import sys
+import threading
 from pathlib import Path
 
 # Add src to path
@@ -16,12 +24,99 @@ sys.path.append(str(Path(__file__).parent / "src"))
 
 from src.search import SemanticSearchEngine
 from src.database import KnowledgeDatabase
+from config.settings import (
+    API_SEARCH_WORKERS,
+    API_MAX_PENDING_SEARCHES,
+    API_BATCH_MAX_QUERIES,
+    API_BATCH_CHUNK_SIZE,
+    API_WARMUP,
+    API_WARMUP_RETRY_SECONDS,
+    API_WARMUP_RETRY_MAX_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+
+class WarmUpState:
+    """
+    Track the startup warm-up that gates readiness.
+    
+    Warm-up runs in the background so the server answers probes while the
+    model and index load; ``ready`` turns true only once it has succeeded
+    (or is disabled). A failed warm-up, such as one before the index has
+    been built, is retried with exponential backoff until it succeeds or
+    the server shuts down.
+    """
+    
+    def __init__(self):
+        self.state = "pending"  # pending -> running -> done | failed (-> running) | skipped
+        self.error = None
+        self.attempts = 0
+        self.timings = {}
+        self._stopped = threading.Event()
+    
+    @property
+    def ready(self) -> bool:
+        return self.state in ("done", "skipped")
+    
+    def run(self):
+        if not API_WARMUP:
+            self.state = "skipped"
+            return
+        if search_engine is None:
+            self.error = "Search engine failed to initialize"
+            self.state = "failed"
+            return
+        
+        delay = API_WARMUP_RETRY_SECONDS
+        while not self._stopped.is_set():
+            self.state = "running"
+            self.attempts += 1
+            try:
+                self.timings = search_engine.warm_up()
+                self.error = None
+                self.state = "done"
+                return
+            except Exception as e:
+                logger.error(f"Search engine warm-up failed (attempt {self.attempts}), "
+                             f"retrying in {delay}s: {str(e)}")
+                self.error = str(e)
+                self.state = "failed"
+            self._stopped.wait(delay)
+            delay = min(delay * 2, API_WARMUP_RETRY_MAX_SECONDS)
+    
+    def stop(self):
+        """Stop retrying; an attempt already running is left to finish."""
+        self._stopped.set()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "error": self.error,
+            "attempts": self.attempts,
+            "seconds": {stage: round(seconds, 3) for stage, seconds in self.timings.items()}
+        }
+
+
+warm_up_state = WarmUpState()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm the search engine up in the background; drain searches on shutdown."""
+    warm_up = asyncio.get_running_loop().run_in_executor(None, warm_up_state.run)
+    yield
+    warm_up_state.stop()
+    await warm_up
+    search_executor.shutdown()
+
 
 # Initialize FastAPI
 app = FastAPI(
     title="Tonkin Knowledge Finder API",
     description="AI-Powered Project Intelligence & Expertise Discovery",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS to allow React frontend
@@ -38,6 +133,81 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class SearchExecutor:
+    """
+    Run blocking searches on a dedicated thread pool, off the event loop.
+    
+    At most ``workers`` searches run at once; up to ``max_pending`` more may
+    wait for a slot, beyond which requests are rejected with 503 instead of
+    queueing without bound. Counters are only touched on the event loop.
+    """
+    
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search")
+        self._slots = None  # Created on first use, inside the running event loop
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+    
+    def check_capacity(self):
+        """Raise 503 if a new search would exceed the pending limit."""
+        if self.waiting >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Search queue is full, please retry")
+    
+    async def run(self, fn: Callable, *args, **kwargs):
+        self.check_capacity()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        
+        # The slot now belongs to the search, not to this request: it is
+        # released when the worker finishes, even if the client disconnects
+        # or times out first, so abandoned searches still count as running
+        loop = asyncio.get_running_loop()
+        self.running += 1
+        try:
+            future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release_threadsafe(loop))
+        return await asyncio.wrap_future(future)
+    
+    def _release(self):
+        self.running -= 1
+        self.completed += 1
+        self._slots.release()
+    
+    def _release_threadsafe(self, loop: asyncio.AbstractEventLoop):
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            pass  # Event loop already closed at shutdown
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "queued": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+    
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+search_executor = SearchExecutor(API_SEARCH_WORKERS, API_MAX_PENDING_SEARCHES)
+
 # Initialize search engine and database
 try:
     search_engine = SemanticSearchEngine()
@@ -56,6 +226,8 @@ class SearchRequest(BaseModel):
     min_trust_score: Optional[float] = 0.0
     categories: Optional[List[str]] = []
     regions: Optional[List[str]] = []
+    keywords: Optional[str] = None
+    phrase: Optional[str] = None
 
 
 class FeedbackRequest(BaseModel):
@@ -99,6 +271,47 @@ class SearchResponse(BaseModel):
     execution_time: float
 
 
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    top_k: Optional[int] = 10
+    min_trust_score: Optional[float] = 0.0
+    categories: Optional[List[str]] = []
+    regions: Optional[List[str]] = []
+    keywords: Optional[str] = None
+    phrase: Optional[str] = None
+
+
+def format_search_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a search engine result for the frontend"""
+    return {
+        "id": result.get('id', 0),
+        "projectNumber": result.get('project_number', f"TKN-{result.get('id', 0):04d}"),
+        "projectName": result.get('project_name', 'Unknown Project'),
+        "description": result.get('description', result.get('snippet', 'No description available.')),
+        "client": result.get('client', 'N/A'),
+        "region": result.get('program_region', 'Melbourne'),
+        "category": result.get('category', 'Infrastructure'),
+        "phase": result.get('lifecycle_phase', 'Active'),
+        "trustScore": float(result.get('trust_score', 0.85)),
+        "similarityScore": float(result.get('similarity_score', 0.75)),
+        "projectLeader": result.get('project_leader', 'N/A'),
+        "projectReviewer": result.get('project_reviewer', 'N/A'),
+        "disciplines": result.get('disciplines', []),
+        "budget": result.get('budget', 'N/A'),
+        "status": "Active",
+        "tags": result.get('tags', []),
+        "lessons": result.get('lessons', [])
+    }
+
+
+def check_filters(filters: Dict[str, Any]):
+    """Reject filters this deployment cannot apply (keyword filters without FTS5) with 501."""
+    try:
+        search_engine.check_filters(filters)
+    except ValueError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+
 # ==================== API ENDPOINTS ====================
 
 @app.get("/")
@@ -114,13 +327,22 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Detailed health check"""
-    return {
-        "status": "healthy",
+    """Detailed health check; 503 until the search engine has warmed up"""
+    if warm_up_state.ready:
+        status = "healthy"
+    elif warm_up_state.state == "failed":
+        status = "degraded"
+    else:
+        status = "warming_up"
+    content = {
+        "status": status,
         "search_engine": "initialized" if search_engine else "not initialized",
         "database": "connected" if db else "not connected",
+        "warm_up": warm_up_state.stats(),
+        "search_queue": search_executor.stats(),
         "timestamp": datetime.now().isoformat()
     }
+    return JSONResponse(content, status_code=200 if warm_up_state.ready else 503)
 
 
 @app.post("/api/search", response_model=SearchResponse)
@@ -133,58 +355,34 @@ async def search_projects(request: SearchRequest):
     - **min_trust_score**: Minimum trust score filter (0.0-1.0)
     - **categories**: List of categories to filter by
     - **regions**: List of regions to filter by
+    - **keywords**: Only return projects containing all of these words
+    - **phrase**: Only return projects containing this exact phrase
     """
     if not search_engine:
         raise HTTPException(status_code=503, detail="Search engine not initialized")
     
+    filters = {
+        'min_trust_score': request.min_trust_score,
+        'categories': request.categories,
+        'regions': request.regions,
+        'keywords': request.keywords,
+        'phrase': request.phrase
+    }
+    check_filters(filters)
+    
     try:
         start_time = datetime.now()
         
-        # Perform semantic search
-        results = search_engine.search(request.query, top_k=request.top_k * 2)  # Get extra for filtering
+        # Perform semantic search on the search executor, keeping the event
+        # loop free; filters are applied inside the index
+        results = await search_executor.run(
+            search_engine.search,
+            request.query,
+            top_k=request.top_k,
+            filters=filters
+        )
         
-        # Apply filters
-        filtered_results = []
-        for result in results:
-            # Trust score filter
-            trust_score = result.get('trust_score', 0)
-            if trust_score < request.min_trust_score:
-                continue
-            
-            # Category filter
-            if request.categories and result.get('category') not in request.categories:
-                continue
-            
-            # Region filter
-            if request.regions and result.get('program_region') not in request.regions:
-                continue
-            
-            # Format result for frontend
-            formatted_result = {
-                "id": result.get('id', 0),
-                "projectNumber": result.get('project_number', f"TKN-{result.get('id', 0):04d}"),
-                "projectName": result.get('project_name', 'Unknown Project'),
-                "description": result.get('description', result.get('snippet', 'No description available.')),
-                "client": result.get('client', 'N/A'),
-                "region": result.get('program_region', 'Melbourne'),
-                "category": result.get('category', 'Infrastructure'),
-                "phase": result.get('lifecycle_phase', 'Active'),
-                "trustScore": float(result.get('trust_score', 0.85)),
-                "similarityScore": float(result.get('similarity_score', 0.75)),
-                "projectLeader": result.get('project_leader', 'N/A'),
-                "projectReviewer": result.get('project_reviewer', 'N/A'),
-                "disciplines": result.get('disciplines', []),
-                "budget": result.get('budget', 'N/A'),
-                "status": "Active",
-                "tags": result.get('tags', []),
-                "lessons": result.get('lessons', [])
-            }
-            
-            filtered_results.append(formatted_result)
-            
-            # Stop if we have enough results
-            if len(filtered_results) >= request.top_k:
-                break
+        filtered_results = [format_search_result(result) for result in results]
         
         execution_time = (datetime.now() - start_time).total_seconds()
         
@@ -195,10 +393,65 @@ async def search_projects(request: SearchRequest):
             execution_time=execution_time
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
 
+@app.post("/api/search/batch")
+async def search_projects_batch(request: BatchSearchRequest):
+    """
+    Search for many queries at once, streaming results as NDJSON
+    
+    Accepts the same filters as /api/search, applied to every query. Each
+    output line is a JSON object {"index", "query", "results", "total"};
+    lines are sent as each chunk of API_BATCH_CHUNK_SIZE queries completes.
+    A full search queue is reported as 503 before streaming starts; if it
+    fills up mid-stream, a final {"index", "error", "status"} line is sent.
+    """
+    if not search_engine:
+        raise HTTPException(status_code=503, detail="Search engine not initialized")
+    if len(request.queries) > API_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400,
+                            detail=f"At most {API_BATCH_MAX_QUERIES} queries per batch")
+    
+    filters = {
+        'min_trust_score': request.min_trust_score,
+        'categories': request.categories,
+        'regions': request.regions,
+        'keywords': request.keywords,
+        'phrase': request.phrase
+    }
+    
+    # Reject up front while a proper status code can still be sent
+    check_filters(filters)
+    search_executor.check_capacity()
+    
+    async def stream_results():
+        for start in range(0, len(request.queries), API_BATCH_CHUNK_SIZE):
+            chunk = request.queries[start:start + API_BATCH_CHUNK_SIZE]
+            # One encode and one FAISS search per chunk
+            try:
+                chunk_results = await search_executor.run(
+                    search_engine.search_many, chunk, top_k=request.top_k, filters=filters
+                )
+            except HTTPException as e:
+                # Headers are already sent; report the failure in the stream
+                yield json.dumps({"index": start, "error": e.detail, "status": e.status_code}) + "\n"
+                return
+            for offset, (query, results) in enumerate(zip(chunk, chunk_results)):
+                line = {
+                    "index": start + offset,
+                    "query": query,
+                    "results": [format_search_result(result) for result in results],
+                    "total": len(results)
+                }
+                yield json.dumps(line, default=str) + "\n"
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
 @app.post("/api/feedback")
 async def submit_feedback(feedback: FeedbackRequest):
     """
@@ -244,8 +497,8 @@ async def submit_lesson(lesson: LessonRequest):
 
 
 @app.get("/api/stats")
-async def get_statistics():
-    """Get system statistics"""
+def get_statistics():
+    """Get system statistics (sync: FastAPI runs it in its threadpool, off the event loop)"""
     try:
         # Get real stats from database
         total_projects = 23  # Default
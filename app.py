@@ -14,8 +14,7 @@ from datetime import datetime
 # Add src to path
 sys.path.append(str(Path(__file__).parent / "src"))
 
-from search import SemanticSearchEngine
-from database import KnowledgeDatabase
+from engine_registry import get_search_engine
 
 # PAGE CONFIG
 st.set_page_config(
@@ -900,9 +899,8 @@ def main():
     # PERFORM SEARCH
     if search_clicked and search_query:
         try:
-            # Initialize search
-            search_engine = SemanticSearchEngine()
-            db = KnowledgeDatabase()
+            # Shared across sessions; reloads only when the index is rebuilt
+            search_engine = get_search_engine()
             results = search_engine.search(search_query, top_k=10)
             
             # Apply filters
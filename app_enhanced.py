@@ -20,8 +20,7 @@ import random
 # Add src to path
 sys.path.append(str(Path(__file__).parent / "src"))
 
-from search import SemanticSearchEngine
-from database import KnowledgeDatabase
+import engine_registry
 from utils import (
     open_file, format_date, get_relative_time, format_file_size,
     create_trust_badges, highlight_query_terms
@@ -639,15 +638,13 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_resource
 def get_search_engine():
-    """Get cached search engine instance."""
-    return SemanticSearchEngine()
+    """Get the process-wide search engine, reloaded when the index changes."""
+    return engine_registry.get_search_engine()
 
-@st.cache_resource
 def get_database():
-    """Get cached database instance."""
-    return KnowledgeDatabase()
+    """Get the process-wide database instance."""
+    return engine_registry.get_database()
 
 @st.cache_data(ttl=300)  # Cache for 5 minutes
 def get_all_projects():
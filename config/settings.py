@@ -11,17 +11,128 @@ PROCESSED_DATA_DIR = DATA_DIR / "processed"
 EMBEDDINGS_DIR = PROCESSED_DATA_DIR / "embeddings"
 DATABASE_PATH = PROCESSED_DATA_DIR / "knowledge_finder.db"
 
-# Create directories if they don't exist
-for dir_path in [RAW_DATA_DIR, PROCESSED_DATA_DIR, EMBEDDINGS_DIR]:
-    dir_path.mkdir(parents=True, exist_ok=True)
+# SQLite connection settings, applied to every pooled connection.
+# WAL lets readers proceed while store_search/store_document write.
+DATABASE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",     # Safe with WAL; fsync at checkpoints only
+    "cache_size": -32000,        # Negative = KiB, i.e. ~32 MB page cache
+    "mmap_size": 268435456,      # 256 MB memory-mapped I/O
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000         # ms to wait on a locked database
+}
+
+# Directories are created on first use (database connections, index
+# writes, setup.py), so importing settings has no filesystem side effects.
+
+# Ingestion settings
+INGEST_WORKERS = None  # Parser processes; None = one per CPU core
+INGEST_BATCH_SIZE = 50  # Documents stored per database transaction
 
 # Embedding model settings
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 EMBEDDING_DIMENSION = 384  # Dimension for all-MiniLM-L6-v2
 
+# Encoder backend for query and document embeddings: "torch" (reference
+# full-precision SentenceTransformer), "onnx" (ONNX Runtime; needs
+# sentence-transformers>=3.2 and optimum[onnxruntime]) or "int8" (PyTorch
+# dynamic int8 quantisation). Other backends are only used once their
+# top-k results on a sample of indexed documents overlap the reference
+# backend's by ENCODER_PARITY_MIN_OVERLAP (checked at ingest and API warm-up);
+# otherwise "torch" is used.
+# "hashed" is a deterministic offline encoder (hashed word and character
+# n-grams) with its own model name, for CI and sites without network
+# access; it needs neither torch nor a model download.
+ENCODER_BACKEND = os.environ.get("ENCODER_BACKEND", "torch")
+ENCODER_ONNX_FILE = None  # e.g. "onnx/model_qint8_avx512_vnni.onnx"; None = default export
+ENCODER_PARITY_CHECK = True
+ENCODER_PARITY_SAMPLE = 200       # Documents encoded by both backends
+ENCODER_PARITY_TOP_K = 10
+ENCODER_PARITY_MIN_OVERLAP = 0.9  # Mean top-k overlap with the reference backend
+
+# Persistent embedding cache keyed on (model name, text hash)
+EMBEDDING_CACHE_PATH = EMBEDDINGS_DIR / "embedding_cache.db"
+EMBEDDING_CACHE_MAX_ENTRIES = 50000  # ~75 MB at 384 float32 dimensions
+
+# Query embedding cache: in-process LRU, optionally backed by the on-disk
+# embedding cache so that several workers share encoded queries
+QUERY_CACHE_SIZE = 1024
+QUERY_CACHE_DISK_TIER = False
+
+# Micro-batching: concurrent searches wait up to QUERY_BATCH_WAIT_MS for each
+# other so their queries share one model.encode and one index.search call
+QUERY_BATCHING = True
+QUERY_BATCH_MAX_SIZE = 32
+QUERY_BATCH_WAIT_MS = 2
+
+# Ranked result lists cached per (query, top_k, threshold, filters, index version)
+RESULT_CACHE_SIZE = 256
+
+# Search history is queued and bulk-inserted by a background thread every
+# HISTORY_FLUSH_INTERVAL_MS or HISTORY_BATCH_SIZE rows. When the queue is
+# full, searches wait up to HISTORY_ENQUEUE_TIMEOUT seconds, then drop the row.
+SEARCH_HISTORY_ASYNC = True
+HISTORY_FLUSH_INTERVAL_MS = 200
+HISTORY_BATCH_SIZE = 256
+HISTORY_QUEUE_SIZE = 10000
+HISTORY_ENQUEUE_TIMEOUT = 0.05
+
 # Search settings
+API_SEARCH_WORKERS = 4          # Threads running searches off the API event loop
+API_MAX_PENDING_SEARCHES = 64   # Searches allowed to wait for a thread before 503s
+API_BATCH_MAX_QUERIES = 1000    # Queries accepted by one /api/search/batch request
+API_BATCH_CHUNK_SIZE = 32       # Queries searched together before streaming their results
+API_WARMUP = True               # Load model and index, run WARMUP_QUERY before /health is ready
+API_WARMUP_RETRY_SECONDS = 5    # First delay before retrying a failed warm-up; doubles each time
+API_WARMUP_RETRY_MAX_SECONDS = 300
+WARMUP_QUERY = "stormwater drainage design"
 MAX_SEARCH_RESULTS = 10
-SIMILARITY_THRESHOLD = 0.3
+SIMILARITY_THRESHOLD = 0.3  # Minimum similarity on the "l2" scale; see SIMILARITY_THRESHOLDS
+FTS_SNIPPET_TOKENS = 32  # Tokens per FTS5 snippet() (SQLite caps this at 64)
+
+# Index metric: "l2" (IndexFlatL2, similarity = 1 / (1 + distance)) or
+# "cosine" (IndexFlatIP over normalised vectors, similarity in [-1, 1]).
+# Switching metric rebuilds the index on the next ingest.
+SEARCH_METRIC = "l2"
+
+# Default minimum similarity for each metric, chosen by the metric of the
+# index searched, since the two scales differ. For unit-length embeddings
+# (as all-MiniLM-L6-v2 produces) squared L2 distance is 2 - 2 * cosine, so
+# the cosine entry keeps the same results as SIMILARITY_THRESHOLD does on
+# "l2". Re-tune both when changing the embedding model.
+SIMILARITY_THRESHOLDS = {
+    "l2": SIMILARITY_THRESHOLD,
+    "cosine": (3 - 1 / SIMILARITY_THRESHOLD) / 2,
+}
+
+# Index type: "flat" (exact), "ivf_flat", "ivf_pq", "hnsw", or "auto" to
+# choose from corpus size: flat up to INDEX_FLAT_MAX_VECTORS, IVF-Flat up to
+# INDEX_IVF_FLAT_MAX_VECTORS, IVF-PQ beyond
+SEARCH_INDEX_TYPE = "auto"
+INDEX_FLAT_MAX_VECTORS = 20000
+INDEX_IVF_FLAT_MAX_VECTORS = 500000
+INDEX_TRAIN_SAMPLE_SIZE = 100000  # Max vectors sampled to train IVF/PQ
+
+# Approximate index parameters (nprobe / efSearch can be overridden per query)
+IVF_NLIST = None           # Inverted lists; None = 4 * sqrt(corpus size)
+IVF_NPROBE = 16            # Lists visited per query: higher = better recall, slower
+IVF_PQ_M = 48              # PQ sub-quantizers; must divide EMBEDDING_DIMENSION
+HNSW_M = 32                # Graph neighbours per node
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64        # Candidate list size per query: higher = better recall, slower
+
+# Hybrid retrieval: BM25 keyword hits (project numbers, people's names) fused
+# with semantic hits by reciprocal rank fusion, score = sum(1 / (RRF_K + rank))
+SEARCH_HYBRID = True
+HYBRID_CANDIDATES = 50     # Hits taken from each retriever before fusion
+RRF_K = 60
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Metadata filters (trust score, category, region) run inside the index via an
+# ID selector. When a filter leaves at most this many documents they are
+# scored exactly instead, so approximate indexes still return top_k results.
+FILTER_EXACT_MAX_VECTORS = 10000
 
 # Trust scoring weights
 TRUST_WEIGHTS = {
@@ -60,5 +171,24 @@ SF84_SECTIONS = [
     "Monitoring & controls"
 ]
 
+# Section-level chunk embeddings (stored in the embeddings table)
+SEARCH_USE_CHUNKS = False  # Rank documents by their best-matching chunks
+CHUNK_SECTIONS = [
+    "background",
+    "scope_of_work",
+    "scope_of_services",
+    "deliverables",
+    "reference_documents",
+    "existing_concept_design",
+    "assumptions",
+    "performance_requirements",
+    "operation_maintenance",
+    "monitoring_controls"
+]
+CHUNK_MAX_WORDS = 150      # all-MiniLM-L6-v2 truncates input at 256 word pieces
+CHUNK_OVERLAP_WORDS = 30
+CHUNK_POOLING = "max"      # Collapse chunk hits per document: "max" or "sum"
+CHUNK_OVERSAMPLE = 5       # Chunks retrieved per requested document
+
 # File type support
 SUPPORTED_EXTENSIONS = [".docx", ".pdf"]
@@ -3,7 +3,10 @@
 import os
 import sys
 import logging
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
 
 # Add src to path so we can import our modules
 sys.path.append(str(Path(__file__).parent.parent / "src"))
@@ -11,18 +14,144 @@ sys.path.append(str(Path(__file__).parent.parent / "src"))
 from parser import DocumentParser, SF84Document
 from database import KnowledgeDatabase
 from search import SemanticSearchEngine
-from utils import setup_logging, create_progress_callback, get_file_metadata
+from utils import setup_logging, create_progress_callback, get_file_metadata, compute_file_hash
+from config.settings import INGEST_WORKERS, INGEST_BATCH_SIZE, SEARCH_USE_CHUNKS
 
 logger = logging.getLogger(__name__)
 
 
-def ingest_documents(data_dir: str, force_rebuild: bool = False) -> int:
+# Per-process parser used by ingestion worker processes
+_worker_parser = None
+
+
+def _parse_file_worker(file_path: str) -> Optional[SF84Document]:
+    """Parse a single file inside a worker process."""
+    global _worker_parser
+    if _worker_parser is None:
+        _worker_parser = DocumentParser()
+    return _worker_parser.parse_file(file_path)
+
+
+def _iter_parsed_documents(files: List[Path], workers: int,
+                           max_in_flight: int) -> Iterator[Tuple[Path, Optional[SF84Document]]]:
+    """
+    Parse files and yield (file_path, document) pairs as they complete.
+    
+    With more than one worker, parsing runs in a process pool with at most
+    ``max_in_flight`` files submitted at a time, so memory stays bounded
+    regardless of how many files are queued. Failed parses yield None.
+    """
+    if workers <= 1:
+        parser = DocumentParser()
+        for file_path in files:
+            try:
+                yield file_path, parser.parse_file(str(file_path))
+            except Exception as e:
+                logger.error(f"Error processing {file_path.name}: {str(e)}")
+                yield file_path, None
+        return
+    
+    files_iter = iter(files)
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        
+        def submit_next() -> bool:
+            file_path = next(files_iter, None)
+            if file_path is None:
+                return False
+            pending[executor.submit(_parse_file_worker, str(file_path))] = file_path
+            return True
+        
+        while len(pending) < max_in_flight and submit_next():
+            pass
+        
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_path = pending.pop(future)
+                try:
+                    doc = future.result()
+                except Exception as e:
+                    logger.error(f"Error processing {file_path.name}: {str(e)}")
+                    doc = None
+                yield file_path, doc
+                submit_next()
+
+
+def _store_batch(db: KnowledgeDatabase, batch: List[SF84Document]) -> int:
+    """Store parsed documents in a single transaction; returns count stored."""
+    stored = 0
+    with db.transaction():
+        for doc in batch:
+            try:
+                doc_data = doc.to_dict()
+                doc_data['searchable_text'] = doc.get_searchable_text()
+                
+                doc_id = db.store_document(doc_data)
+                logger.debug(f"Stored document with ID: {doc_id}")
+                stored += 1
+            except Exception as e:
+                logger.error(f"Error storing {doc.file_name}: {str(e)}")
+    return stored
+
+
+def _find_changed_files(db: KnowledgeDatabase, files: List[Path]) -> List[Path]:
+    """
+    Return the files that are new or have changed since they were ingested.
+    
+    Compares each file against a manifest of (modified_date, file_size,
+    content_hash) loaded once from the database. Files whose mtime and size
+    match are skipped without being read; files whose mtime moved but whose
+    content hash is unchanged are skipped and their stored mtime refreshed.
+    """
+    manifest = db.get_file_manifest()
+    changed = []
+    touched = []
+    
+    for file_path in files:
+        entry = manifest.get(str(file_path))
+        if entry is None:
+            changed.append(file_path)
+            continue
+        
+        stored_mtime, stored_size, stored_hash = entry
+        try:
+            stat = file_path.stat()
+        except OSError as e:
+            logger.warning(f"Cannot stat {file_path.name}: {str(e)}")
+            continue
+        
+        modified_date = datetime.fromtimestamp(stat.st_mtime).isoformat()
+        if stat.st_size != stored_size:
+            changed.append(file_path)
+        elif modified_date == stored_mtime:
+            continue
+        elif stored_hash and compute_file_hash(str(file_path)) == stored_hash:
+            touched.append({'file_path': str(file_path), 'modified_date': modified_date})
+        else:
+            changed.append(file_path)
+    
+    if touched:
+        with db.transaction():
+            for doc_data in touched:
+                db.store_document(doc_data)
+        logger.debug(f"Refreshed modification time of {len(touched)} unchanged files")
+    
+    return changed
+
+
+def ingest_documents(data_dir: str, force_rebuild: bool = False,
+                     workers: int = None, batch_size: int = None) -> int:
     """
     Ingest all supported documents from data directory.
     
     Args:
         data_dir: Directory containing documents to ingest
         force_rebuild: Whether to reprocess existing documents
+        workers: Number of parser processes (default: INGEST_WORKERS, or one
+            per CPU core); 1 parses in the current process
+        batch_size: Documents stored per database transaction
     
     Returns:
         Number of documents successfully processed
@@ -32,8 +161,10 @@ def ingest_documents(data_dir: str, force_rebuild: bool = False) -> int:
         logger.error(f"Data directory not found: {data_dir}")
         return 0
     
+    workers = workers or INGEST_WORKERS or os.cpu_count() or 1
+    batch_size = batch_size or INGEST_BATCH_SIZE
+    
     # Initialize components
-    parser = DocumentParser()
     db = KnowledgeDatabase()
     
     # Find all supported files
@@ -47,42 +178,41 @@ def ingest_documents(data_dir: str, force_rebuild: bool = False) -> int:
     
     logger.info(f"Found {len(supported_files)} files to process")
     
+    # Check if already processed (unless force rebuild)
+    files_to_parse = supported_files
+    if not force_rebuild:
+        files_to_parse = _find_changed_files(db, supported_files)
+        skipped = len(supported_files) - len(files_to_parse)
+        if skipped:
+            logger.info(f"Skipping {skipped} unchanged files")
+    
     # Create progress callback
     progress = create_progress_callback(len(supported_files), "Ingesting documents")
+    completed = len(supported_files) - len(files_to_parse)
+    
+    workers = min(workers, max(len(files_to_parse), 1))
+    logger.info(f"Parsing {len(files_to_parse)} files with {workers} worker(s)")
     
     successful_count = 0
+    batch = []
     
-    for i, file_path in enumerate(supported_files):
-        try:
-            progress(i)
-            
-            # Check if already processed (unless force rebuild)
-            if not force_rebuild:
-                existing_docs = db.get_all_documents()
-                if any(doc['file_path'] == str(file_path) for doc in existing_docs):
-                    logger.debug(f"Skipping already processed: {file_path.name}")
-                    continue
-            
-            logger.info(f"Processing: {file_path.name}")
-            
-            # Parse document
-            doc = parser.parse_file(str(file_path))
-            if doc is None:
-                logger.warning(f"Failed to parse: {file_path.name}")
-                continue
-            
-            # Store in database
-            doc_data = doc.to_dict()
-            doc_data['searchable_text'] = doc.get_searchable_text()
-            
-            doc_id = db.store_document(doc_data)
-            logger.debug(f"Stored document with ID: {doc_id}")
-            
-            successful_count += 1
-            
-        except Exception as e:
-            logger.error(f"Error processing {file_path.name}: {str(e)}")
+    # Parsing fans out to workers; storage stays on this single writer
+    for file_path, doc in _iter_parsed_documents(files_to_parse, workers, max_in_flight=workers * 4):
+        progress(completed)
+        completed += 1
+        
+        if doc is None:
+            logger.warning(f"Failed to parse: {file_path.name}")
             continue
+        
+        logger.info(f"Processed: {file_path.name}")
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            successful_count += _store_batch(db, batch)
+            batch = []
+    
+    if batch:
+        successful_count += _store_batch(db, batch)
     
     progress(len(supported_files))  # Complete progress
     
@@ -90,12 +220,14 @@ def ingest_documents(data_dir: str, force_rebuild: bool = False) -> int:
     return successful_count
 
 
-def create_search_index(force_rebuild: bool = False) -> bool:
+def create_search_index(force_rebuild: bool = False, build_chunks: bool = None) -> bool:
     """
     Create or update the search index.
     
     Args:
         force_rebuild: Whether to rebuild index from scratch
+        build_chunks: Also build section-level chunk embeddings
+            (default: SEARCH_USE_CHUNKS)
     
     Returns:
         True if successful, False otherwise
@@ -104,7 +236,21 @@ def create_search_index(force_rebuild: bool = False) -> bool:
     
     search_engine = SemanticSearchEngine()
     
-    success = search_engine.create_embeddings_for_documents(force_rebuild=force_rebuild)
+    # Check a quantised/ONNX encoder against the reference model before it
+    # encodes anything; searches then reuse the recorded result
+    search_engine.verify_encoder_backend()
+    
+    # Without a forced rebuild, only encode documents added or changed since the last build
+    success = search_engine.create_embeddings_for_documents(
+        force_rebuild=force_rebuild,
+        incremental=not force_rebuild
+    )
+    
+    if success and (SEARCH_USE_CHUNKS if build_chunks is None else build_chunks):
+        success = search_engine.create_chunk_embeddings(force_rebuild=force_rebuild)
+    
+    if success:
+        success = search_engine.create_lexical_index()
     
     if success:
         stats = search_engine.get_index_stats()
@@ -136,6 +282,28 @@ def main():
         choices=["DEBUG", "INFO", "WARNING", "ERROR"],
         help="Logging level"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of parallel parser processes (default: one per CPU core)"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="Documents stored per database transaction"
+    )
+    parser.add_argument(
+        "--chunks",
+        action="store_true",
+        help="Also build section-level chunk embeddings and the chunk index"
+    )
+    parser.add_argument(
+        "--recall-report",
+        action="store_true",
+        help="Print recall@k and latency of the index against exact search"
+    )
     parser.add_argument(
         "--skip-indexing",
         action="store_true", 
@@ -155,19 +323,29 @@ def main():
     
     try:
         # Step 1: Ingest documents
-        doc_count = ingest_documents(str(data_dir), args.force_rebuild)
+        doc_count = ingest_documents(str(data_dir), args.force_rebuild,
+                                     workers=args.workers, batch_size=args.batch_size)
         
-        if doc_count == 0:
+        if doc_count == 0 and KnowledgeDatabase().get_stats()['total_documents'] == 0:
             logger.warning("No documents were ingested. Exiting.")
             return 1
         
         # Step 2: Create search index (unless skipped)
         if not args.skip_indexing:
-            success = create_search_index(args.force_rebuild)
+            success = create_search_index(args.force_rebuild, build_chunks=args.chunks or None)
             if not success:
                 logger.error("Failed to create search index")
                 return 1
         
+        if args.recall_report:
+            report = SemanticSearchEngine().recall_report()
+            logger.info(f"Recall report ({report.get('index_type')}, "
+                        f"{report.get('total_vectors')} vectors, k={report.get('top_k')}, "
+                        f"flat {report.get('flat_ms_per_query')} ms/query):")
+            for row in report.get('results', []):
+                logger.info(f"  {row['parameter'] or 'exact'}={row['value']}: "
+                            f"recall={row['recall_at_k']:.3f}, {row['ms_per_query']} ms/query")
+        
         logger.info("Ingestion completed successfully!")
         
         # Show final stats
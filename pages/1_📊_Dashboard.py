@@ -13,7 +13,7 @@ import sqlite3
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent.parent / "src"))
 
-from database import KnowledgeDatabase
+from engine_registry import get_database
 
 # PAGE CONFIG
 st.set_page_config(
@@ -152,7 +152,7 @@ st.markdown("""
 def get_database_stats():
     """Get real statistics from the database"""
     try:
-        db = KnowledgeDatabase()
+        db = get_database()
         
         # Get total projects (documents)
         documents = db.get_all_documents()
@@ -290,7 +290,7 @@ def main():
     st.markdown("## Project Details")
     
     try:
-        db = KnowledgeDatabase()
+        db = get_database()
         documents = db.get_all_documents()
         
         if documents:
@@ -45,7 +45,7 @@ def main():
         sys.exit(1)
     
     # Create necessary directories
-    dirs_to_create = ["data", "embeddings", "data/processed"]
+    dirs_to_create = ["data/raw", "embeddings", "data/processed/embeddings"]
     for dir_name in dirs_to_create:
         Path(dir_name).mkdir(parents=True, exist_ok=True)
     print("✅ Created necessary directories")
@@ -1,27 +1,197 @@
 """Database operations for storing documents, embeddings, and feedback."""
 
+import os
+import re
 import sqlite3
 import json
 import logging
-from typing import List, Dict, Optional, Any
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Any, Iterator, Tuple
 from datetime import datetime
 from pathlib import Path
 
-from config.settings import DATABASE_PATH
+from config.settings import DATABASE_PATH, DATABASE_PRAGMAS, FTS_SNIPPET_TOKENS
 
 logger = logging.getLogger(__name__)
 
+# Conservative bound on "?" parameters per statement (SQLite < 3.32 allows 999)
+SQLITE_MAX_VARIABLES = 900
+
+# Columns added to tables after their first release: table -> {name: type}
+COLUMN_MIGRATIONS = {
+    'documents': {
+        'content_hash': 'TEXT',
+    },
+    'embeddings': {
+        'model_name': 'TEXT',
+    },
+}
+
+
+# documents columns mirrored into the documents_fts full-text index
+FTS_COLUMNS = [
+    'project_name',
+    'project_number',
+    'client',
+    'project_leader',
+    'project_reviewer',
+    'searchable_text',
+]
+
+
+class _ThreadConnection:
+    """A thread's pooled connection; closing it is tied to this object's lifetime."""
+    
+    __slots__ = ('conn', 'depth', 'close', '__weakref__')
+    
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.depth = 0  # Nesting of connection() scopes
+        self.close = weakref.finalize(self, conn.close)
+        self.close.atexit = False  # Leave exit-time writers (search history flush) a connection
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of SQLite connections, one reusable connection per thread.
+    
+    Connections are opened lazily, configured with DATABASE_PRAGMAS (WAL
+    journal, relaxed fsync, larger page cache and mmap) and kept open for the
+    life of the thread. Only the thread's local storage holds a connection,
+    so it is closed when the thread exits. The pool is fork-aware: a child
+    process never reuses connections inherited from its parent.
+    """
+    
+    def __init__(self, db_path: str, pragmas: Dict[str, Any] = None):
+        self.db_path = str(db_path)
+        self.pragmas = DATABASE_PRAGMAS if pragmas is None else pragmas
+        self._lock = threading.Lock()
+        self._reset()
+    
+    def _reset(self):
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._connections = weakref.WeakSet()  # Live _ThreadConnections, for close_all()
+    
+    def _open(self) -> sqlite3.Connection:
+        # check_same_thread=False only so close_all() can run from any thread;
+        # each connection is otherwise confined to the thread that opened it.
+        # Data directories are created here, on first use, not at import.
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            try:
+                conn.execute(f"PRAGMA {name} = {value}")
+            except sqlite3.DatabaseError as e:
+                logger.warning(f"Could not set PRAGMA {name}={value} on {self.db_path}: {e}")
+        return conn
+    
+    def _thread_connection(self) -> _ThreadConnection:
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+        
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            holder = _ThreadConnection(self._open())
+            self._local.holder = holder
+            with self._lock:
+                self._connections.add(holder)
+        return holder
+    
+    def get(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, opening it on first use."""
+        return self._thread_connection().conn
+    
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Yield the thread's connection inside a transaction scope.
+        
+        Scopes nest: only the outermost one commits (or rolls back on error),
+        so several operations can be grouped into a single transaction.
+        """
+        holder = self._thread_connection()
+        conn = holder.conn
+        holder.depth += 1
+        try:
+            yield conn
+        except BaseException:
+            holder.depth -= 1
+            if holder.depth == 0:
+                conn.rollback()
+            raise
+        else:
+            holder.depth -= 1
+            if holder.depth == 0:
+                conn.commit()
+    
+    def close_all(self):
+        """Close every connection opened by this pool."""
+        with self._lock:
+            holders, self._connections = list(self._connections), weakref.WeakSet()
+            self._local = threading.local()
+        for holder in holders:
+            try:
+                holder.close()
+            except sqlite3.Error:
+                pass
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_schema_ready = set()
+_registry_lock = threading.Lock()
+
+
+def get_connection_pool(db_path: str) -> ConnectionPool:
+    """Return the process-wide connection pool for a database file."""
+    key = os.path.abspath(str(db_path))
+    with _registry_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(key)
+            _pools[key] = pool
+        return pool
+
 
 class KnowledgeDatabase:
     """SQLite database for storing documents, embeddings, and user feedback."""
     
     def __init__(self, db_path: str = None):
         self.db_path = db_path or DATABASE_PATH
-        self.init_database()
+        self._pool = get_connection_pool(self.db_path)
+        self._fts_available = None  # Whether documents_fts exists; checked lazily
+        self._ensure_schema()
+    
+    def transaction(self):
+        """
+        Group several operations into a single transaction.
+        
+        Calls made inside the block share the thread's connection and are
+        committed together when the outermost block exits.
+        """
+        return self._pool.connection()
+    
+    _connection = transaction  # Every internal operation runs in the caller's transaction, if any
+    
+    def _ensure_schema(self):
+        """Create tables once per process per database file."""
+        key = self._pool.db_path
+        if key in _schema_ready:
+            return
+        with _registry_lock:
+            if key in _schema_ready:
+                return
+            self.init_database()
+            _schema_ready.add(key)
     
     def init_database(self):
         """Initialize database tables."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             
             # Documents table
@@ -33,6 +203,7 @@ class KnowledgeDatabase:
                     file_size INTEGER,
                     created_date TEXT,
                     modified_date TEXT,
+                    content_hash TEXT,
                     project_name TEXT,
                     project_number TEXT,
                     program_region TEXT,
@@ -67,6 +238,7 @@ class KnowledgeDatabase:
                     section_name TEXT,
                     text_content TEXT,
                     embedding_vector BLOB,
+                    model_name TEXT,
                     created_date TEXT DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (document_id) REFERENCES documents (id)
                 )
@@ -95,11 +267,149 @@ class KnowledgeDatabase:
                 )
             """)
             
-            conn.commit()
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_document_id ON embeddings (document_id)")
+            
+            # Add columns introduced after the original schema
+            for table, columns in COLUMN_MIGRATIONS.items():
+                cursor.execute(f"PRAGMA table_info({table})")
+                existing_columns = {row[1] for row in cursor.fetchall()}
+                for column, column_type in columns.items():
+                    if column not in existing_columns:
+                        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+            
+            # Metadata table holding the documents generation counter, bumped
+            # by triggers on every change so caches can detect stale results
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS metadata (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            cursor.execute("INSERT OR IGNORE INTO metadata (key, value) VALUES ('documents_generation', 0)")
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS documents_generation_{event.lower()}
+                    AFTER {event} ON documents
+                    BEGIN
+                        UPDATE metadata SET value = value + 1 WHERE key = 'documents_generation';
+                    END
+                """)
+            
+            self._init_full_text_index(cursor)
+    
+    @staticmethod
+    def _init_full_text_index(cursor: sqlite3.Cursor):
+        """
+        Create the documents_fts FTS5 table and the triggers keeping it in sync.
+        
+        The table uses documents as external content, so only the index is
+        stored. Rows that existed before the table was created are backfilled.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'documents_fts'")
+        existed = cursor.fetchone() is not None
+        
+        columns = ', '.join(FTS_COLUMNS)
+        new_values = ', '.join(f'new.{column}' for column in FTS_COLUMNS)
+        old_values = ', '.join(f'old.{column}' for column in FTS_COLUMNS)
+        try:
+            cursor.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts
+                USING fts5({columns}, content='documents', content_rowid='id')
+            """)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite FTS5 not available; keyword search disabled: {str(e)}")
+            return
+        
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS documents_fts_insert AFTER INSERT ON documents
+            BEGIN
+                INSERT INTO documents_fts (rowid, {columns}) VALUES (new.id, {new_values});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS documents_fts_delete AFTER DELETE ON documents
+            BEGIN
+                INSERT INTO documents_fts (documents_fts, rowid, {columns})
+                VALUES ('delete', old.id, {old_values});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS documents_fts_update AFTER UPDATE OF {columns} ON documents
+            BEGIN
+                INSERT INTO documents_fts (documents_fts, rowid, {columns})
+                VALUES ('delete', old.id, {old_values});
+                INSERT INTO documents_fts (rowid, {columns}) VALUES (new.id, {new_values});
+            END
+        """)
+        
+        if not existed:
+            cursor.execute("INSERT INTO documents_fts (documents_fts) VALUES ('rebuild')")
+    
+    def has_full_text_index(self) -> bool:
+        """Whether the documents_fts table exists (SQLite built with FTS5)."""
+        if self._fts_available is None:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'documents_fts'")
+                self._fts_available = cursor.fetchone() is not None
+        return self._fts_available
+    
+    @staticmethod
+    def fts_query(query: str, phrase: bool = False, match_all: bool = False) -> Optional[str]:
+        """
+        Build an FTS5 MATCH expression from free text.
+        
+        Every whitespace-separated term is quoted, so user input cannot
+        inject FTS5 syntax and identifiers such as "TKN-2024-SW-001" match as
+        a token sequence. Terms are OR-ed unless ``match_all``; ``phrase``
+        matches the whole query as one exact phrase.
+        """
+        terms = [term for term in query.split() if re.search(r'\w', term)]
+        if not terms:
+            return None
+        if phrase:
+            return '"' + ' '.join(terms).replace('"', '""') + '"'
+        quoted = ['"' + term.replace('"', '""') + '"' for term in terms]
+        return (' AND ' if match_all else ' OR ').join(quoted)
+    
+    def match_documents(self, query: str, limit: int = None, phrase: bool = False,
+                        match_all: bool = True) -> Optional[List[int]]:
+        """
+        Return IDs of documents matching a keyword query, best (BM25) first.
+        
+        Used as a keyword prefilter for semantic search. Returns None when
+        FTS5 is unavailable, so callers can tell that apart from no match,
+        and an empty list when the query has no searchable terms.
+        """
+        if not self.has_full_text_index():
+            return None
+        match = self.fts_query(query, phrase=phrase, match_all=match_all)
+        if not match:
+            return []
+        
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            sql = "SELECT rowid FROM documents_fts WHERE documents_fts MATCH ? ORDER BY rank"
+            params = [match]
+            if limit:
+                sql += " LIMIT ?"
+                params.append(int(limit))
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+    
+    def get_documents_generation(self) -> int:
+        """Return a counter that changes whenever the documents table changes."""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT value FROM metadata WHERE key = 'documents_generation'")
+            row = cursor.fetchone()
+            return row[0] if row else 0
     
     def store_document(self, doc_data: Dict[str, Any]) -> int:
         """Store or update a document in the database."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             
             # Convert trust_badges list to JSON string
@@ -136,71 +446,221 @@ class KnowledgeDatabase:
                 insert_query = f"INSERT INTO documents ({', '.join(fields)}) VALUES ({placeholders})"
                 cursor.execute(insert_query, values)
                 doc_id = cursor.lastrowid
-            
-            conn.commit()
             return doc_id
     
+    @staticmethod
+    def _row_to_document(row: sqlite3.Row) -> Dict[str, Any]:
+        """Convert a documents row to a dict, decoding trust_badges JSON."""
+        doc = dict(row)
+        if doc['trust_badges']:
+            try:
+                doc['trust_badges'] = json.loads(doc['trust_badges'])
+            except json.JSONDecodeError:
+                doc['trust_badges'] = []
+        return doc
+    
     def get_document(self, doc_id: int) -> Optional[Dict[str, Any]]:
         """Retrieve a document by ID."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute("SELECT * FROM documents WHERE id = ?", (doc_id,))
             row = cursor.fetchone()
             
             if row:
-                doc = dict(row)
-                # Parse trust_badges JSON
-                if doc['trust_badges']:
-                    try:
-                        doc['trust_badges'] = json.loads(doc['trust_badges'])
-                    except json.JSONDecodeError:
-                        doc['trust_badges'] = []
-                return doc
+                return self._row_to_document(row)
             
             return None
     
+    def get_documents(self, doc_ids: List[int]) -> List[Dict[str, Any]]:
+        """
+        Retrieve several documents by ID in a single query.
+        
+        Results follow the order of ``doc_ids`` (e.g. FAISS rank order);
+        IDs with no matching row are skipped.
+        """
+        if not doc_ids:
+            return []
+        
+        unique_ids = list(dict.fromkeys(int(doc_id) for doc_id in doc_ids))
+        found = {}
+        
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            # Stay under SQLite's bound-parameter limit for very large batches
+            for start in range(0, len(unique_ids), SQLITE_MAX_VARIABLES):
+                chunk = unique_ids[start:start + SQLITE_MAX_VARIABLES]
+                placeholders = ', '.join('?' for _ in chunk)
+                cursor.execute(f"SELECT * FROM documents WHERE id IN ({placeholders})", chunk)
+                for row in cursor.fetchall():
+                    found[row['id']] = row
+        
+        return [self._row_to_document(found[doc_id])
+                for doc_id in (int(i) for i in doc_ids) if doc_id in found]
+    
+    def get_documents_with_snippets(self, doc_ids: List[int], query: str,
+                                    max_tokens: int = FTS_SNIPPET_TOKENS) -> List[Dict[str, Any]]:
+        """
+        Retrieve documents like get_documents, with FTS5 snippets for a query.
+        
+        Snippets come from the same SQL round trip. Documents containing a
+        query term get ``snippet`` (plain text) and ``highlighted_snippet``
+        (terms in **bold**). Documents matching no term get neither, and
+        neither does anything when FTS5 is unavailable.
+        """
+        match = self.fts_query(query)
+        if not doc_ids or not match or not self.has_full_text_index():
+            return self.get_documents(doc_ids)
+        
+        unique_ids = list(dict.fromkeys(int(doc_id) for doc_id in doc_ids))
+        column = FTS_COLUMNS.index('searchable_text')
+        chunk_size = (SQLITE_MAX_VARIABLES - 3) // 2
+        found = {}
+        
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                
+                for start in range(0, len(unique_ids), chunk_size):
+                    chunk = unique_ids[start:start + chunk_size]
+                    placeholders = ', '.join('?' for _ in chunk)
+                    cursor.execute(f"""
+                        SELECT d.*, s.snippet AS fts_snippet, s.highlighted AS fts_highlighted
+                        FROM documents d
+                        LEFT JOIN (
+                            SELECT rowid,
+                                   snippet(documents_fts, {column}, '', '', '...', ?) AS snippet,
+                                   snippet(documents_fts, {column}, '**', '**', '...', ?) AS highlighted
+                            FROM documents_fts
+                            WHERE documents_fts MATCH ? AND rowid IN ({placeholders})
+                        ) s ON s.rowid = d.id
+                        WHERE d.id IN ({placeholders})
+                    """, [max_tokens, max_tokens, match, *chunk, *chunk])
+                    for row in cursor.fetchall():
+                        found[row['id']] = row
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Full-text snippet query failed: {str(e)}")
+            return self.get_documents(doc_ids)
+        
+        documents = []
+        for doc_id in (int(i) for i in doc_ids):
+            if doc_id not in found:
+                continue
+            document = self._row_to_document(found[doc_id])
+            snippet = document.pop('fts_snippet')
+            highlighted = document.pop('fts_highlighted')
+            if snippet:
+                document['snippet'] = snippet
+                document['highlighted_snippet'] = highlighted
+            documents.append(document)
+        return documents
+    
+    def get_file_manifest(self) -> Dict[str, Tuple[Optional[str], Optional[int], Optional[str]]]:
+        """
+        Map file_path -> (modified_date, file_size, content_hash) for all documents.
+        
+        Reads only the columns needed to decide whether a file on disk has
+        changed since it was ingested.
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT file_path, modified_date, file_size, content_hash FROM documents")
+            return {row[0]: (row[1], row[2], row[3]) for row in cursor.fetchall()}
+    
+    def get_filter_metadata(self) -> List[Tuple[int, Optional[float], Optional[str], Optional[str]]]:
+        """
+        Return (id, trust_score, category, program_region) for all documents.
+        
+        Used to build the columnar arrays behind in-index search filters.
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT id, trust_score, category, program_region FROM documents ORDER BY id")
+            return [tuple(row) for row in cursor.fetchall()]
+    
     def get_all_documents(self) -> List[Dict[str, Any]]:
         """Retrieve all documents."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute("SELECT * FROM documents ORDER BY indexed_date DESC")
             rows = cursor.fetchall()
             
-            documents = []
-            for row in rows:
-                doc = dict(row)
-                # Parse trust_badges JSON
-                if doc['trust_badges']:
-                    try:
-                        doc['trust_badges'] = json.loads(doc['trust_badges'])
-                    except json.JSONDecodeError:
-                        doc['trust_badges'] = []
-                documents.append(doc)
-            
-            return documents
+            return [self._row_to_document(row) for row in rows]
     
     def store_embedding(self, document_id: int, section_name: str, 
                        text_content: str, embedding_vector: bytes) -> int:
         """Store an embedding vector for a document section."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute("""
                 INSERT INTO embeddings (document_id, section_name, text_content, embedding_vector)
                 VALUES (?, ?, ?, ?)
             """, (document_id, section_name, text_content, embedding_vector))
-            
-            conn.commit()
             return cursor.lastrowid
     
+    def replace_embeddings(self, document_id: int, model_name: str,
+                           chunks: List[Tuple[str, str, bytes]]) -> List[int]:
+        """
+        Replace all section embeddings of a document in one transaction.
+        
+        Args:
+            document_id: Owning document
+            model_name: Model that produced the vectors
+            chunks: (section_name, text_content, embedding_vector) tuples
+        
+        Returns:
+            IDs of the inserted embedding rows, in chunk order
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("DELETE FROM embeddings WHERE document_id = ?", (document_id,))
+            ids = []
+            for section_name, text_content, embedding_vector in chunks:
+                cursor.execute("""
+                    INSERT INTO embeddings (document_id, section_name, text_content,
+                                            embedding_vector, model_name)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (document_id, section_name, text_content, embedding_vector, model_name))
+                ids.append(cursor.lastrowid)
+            return ids
+    
+    def delete_embeddings(self, document_ids: List[int]) -> int:
+        """Delete section embeddings belonging to the given documents."""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            deleted = 0
+            for doc_id in document_ids:
+                cursor.execute("DELETE FROM embeddings WHERE document_id = ?", (doc_id,))
+                deleted += cursor.rowcount
+            return deleted
+    
+    def get_embedding_chunks(self, with_vectors: bool = False) -> List[Dict[str, Any]]:
+        """
+        Retrieve all section embedding rows ordered by document.
+        
+        The vector blobs are only read when ``with_vectors`` is set, so the
+        chunk layout can be compared cheaply before deciding what to encode.
+        """
+        columns = "id, document_id, section_name, text_content, model_name"
+        if with_vectors:
+            columns += ", embedding_vector"
+        
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(f"SELECT {columns} FROM embeddings ORDER BY document_id, id")
+            return [dict(row) for row in cursor.fetchall()]
+    
     def get_embeddings(self, document_id: int = None) -> List[Dict[str, Any]]:
         """Retrieve embeddings, optionally filtered by document ID."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connection() as conn:
             cursor = conn.cursor()
             
             if document_id:
@@ -214,21 +674,18 @@ class KnowledgeDatabase:
     def store_feedback(self, document_id: int, search_query: str, 
                       feedback_type: str, lesson_learned: str = None) -> int:
         """Store user feedback for a document."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute("""
                 INSERT INTO feedback (document_id, search_query, feedback_type, lesson_learned)
                 VALUES (?, ?, ?, ?)
             """, (document_id, search_query, feedback_type, lesson_learned))
-            
-            conn.commit()
             return cursor.lastrowid
     
     def get_feedback(self, document_id: int = None) -> List[Dict[str, Any]]:
         """Retrieve feedback, optionally filtered by document ID."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connection() as conn:
             cursor = conn.cursor()
             
             if document_id:
@@ -241,21 +698,26 @@ class KnowledgeDatabase:
     
     def store_search(self, query: str, results_count: int) -> int:
         """Store search history."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute("""
                 INSERT INTO search_history (query, results_count)
                 VALUES (?, ?)
             """, (query, results_count))
-            
-            conn.commit()
             return cursor.lastrowid
     
+    def store_searches(self, rows: List[Tuple[str, int, str]]):
+        """Store many (query, results_count, search_date) history rows in one transaction."""
+        with self._connection() as conn:
+            conn.executemany("""
+                INSERT INTO search_history (query, results_count, search_date)
+                VALUES (?, ?, ?)
+            """, rows)
+    
     def get_search_history(self, limit: int = 50) -> List[Dict[str, Any]]:
         """Retrieve recent search history."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute("SELECT * FROM search_history ORDER BY search_date DESC LIMIT ?", (limit,))
@@ -264,7 +726,7 @@ class KnowledgeDatabase:
     
     def get_stats(self) -> Dict[str, Any]:
         """Get database statistics."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             
             stats = {}
@@ -290,7 +752,7 @@ class KnowledgeDatabase:
     
     def delete_document(self, document_id: int) -> bool:
         """Delete a document and all related data."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             
             try:
@@ -302,8 +764,6 @@ class KnowledgeDatabase:
                 
                 # Delete document
                 cursor.execute("DELETE FROM documents WHERE id = ?", (document_id,))
-                
-                conn.commit()
                 return cursor.rowcount > 0
                 
             except Exception as e:
@@ -0,0 +1,120 @@
+"""Persistent cache of document embeddings keyed by model name and text hash."""
+
+import time
+import hashlib
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+from config.settings import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES
+from database import get_connection_pool, SQLITE_MAX_VARIABLES
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    Size-bounded on-disk cache of (model name, text hash) -> embedding.
+    
+    Vectors are stored as raw float32 bytes and keys as 20-byte SHA-1
+    digests, so an entry costs little more than the vector itself. When the
+    cache grows past ``max_entries`` the least recently used entries are
+    evicted.
+    """
+    
+    def __init__(self, cache_path: str = None, max_entries: int = None):
+        self.cache_path = cache_path or EMBEDDING_CACHE_PATH
+        self.max_entries = max_entries or EMBEDDING_CACHE_MAX_ENTRIES
+        self._pool = get_connection_pool(self.cache_path)
+        self.init_cache()
+    
+    def init_cache(self):
+        """Initialize the cache table."""
+        with self._pool.connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    model_name TEXT NOT NULL,
+                    text_hash BLOB NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model_name, text_hash)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used
+                ON embedding_cache (last_used)
+            """)
+    
+    @staticmethod
+    def text_key(text: str) -> bytes:
+        """Hash text into the compact cache key."""
+        return hashlib.sha1(text.encode('utf-8')).digest()
+    
+    def get_many(self, model_name: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Look up embeddings for texts; misses are returned as None."""
+        keys = [self.text_key(text) for text in texts]
+        found = {}
+        
+        with self._pool.connection() as conn:
+            unique_keys = list(dict.fromkeys(keys))
+            for start in range(0, len(unique_keys), SQLITE_MAX_VARIABLES - 1):
+                chunk = unique_keys[start:start + SQLITE_MAX_VARIABLES - 1]
+                placeholders = ', '.join('?' for _ in chunk)
+                cursor = conn.execute(
+                    f"SELECT text_hash, vector FROM embedding_cache "
+                    f"WHERE model_name = ? AND text_hash IN ({placeholders})",
+                    [model_name] + chunk
+                )
+                for text_hash, vector in cursor.fetchall():
+                    found[bytes(text_hash)] = np.frombuffer(vector, dtype=np.float32)
+            
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE embedding_cache SET last_used = ? WHERE model_name = ? AND text_hash = ?",
+                    [(now, model_name, key) for key in found]
+                )
+        
+        return [found.get(key) for key in keys]
+    
+    def put_many(self, model_name: str, texts: List[str], embeddings: np.ndarray):
+        """Store embeddings for texts, evicting old entries if over capacity."""
+        now = time.time()
+        rows = [
+            (model_name, self.text_key(text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in zip(texts, embeddings)
+        ]
+        
+        with self._pool.connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (model_name, text_hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._evict(conn)
+    
+    def _evict(self, conn):
+        """Drop least recently used entries beyond max_entries."""
+        count = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            conn.execute("""
+                DELETE FROM embedding_cache WHERE (model_name, text_hash) IN (
+                    SELECT model_name, text_hash FROM embedding_cache
+                    ORDER BY last_used ASC LIMIT ?
+                )
+            """, (excess,))
+            logger.debug(f"Evicted {excess} embedding cache entries")
+    
+    def clear(self, model_name: str = None):
+        """Remove cached embeddings, optionally only those for one model."""
+        with self._pool.connection() as conn:
+            if model_name:
+                conn.execute("DELETE FROM embedding_cache WHERE model_name = ?", (model_name,))
+            else:
+                conn.execute("DELETE FROM embedding_cache")
+    
+    def __len__(self) -> int:
+        with self._pool.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
@@ -0,0 +1,186 @@
+"""Pluggable sentence encoder backends for the semantic search engine."""
+
+import re
+import zlib
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import ENCODER_ONNX_FILE, EMBEDDING_DIMENSION
+
+logger = logging.getLogger(__name__)
+
+# Backend whose vectors the others are checked against
+REFERENCE_BACKEND = "torch"
+
+# Backend name -> factory taking a model name and returning an object with
+# a SentenceTransformer-compatible encode(texts, convert_to_numpy=True)
+ENCODER_BACKENDS: Dict[str, Callable[[str], Any]] = {}
+
+# Backend name -> fixed model name, for backends that are a model of their
+# own rather than a runtime for EMBEDDING_MODEL
+ENCODER_MODEL_NAMES: Dict[str, str] = {}
+
+
+def register_encoder(name: str, factory: Callable[[str], Any], model_name: str = None):
+    """
+    Register an encoder backend selectable through ENCODER_BACKEND.
+    
+    Pass ``model_name`` when the backend produces its own vectors instead of
+    running EMBEDDING_MODEL; indexes and caches are then keyed on that name
+    and no parity check against the reference backend applies.
+    """
+    ENCODER_BACKENDS[name] = factory
+    if model_name:
+        ENCODER_MODEL_NAMES[name] = model_name
+    else:
+        ENCODER_MODEL_NAMES.pop(name, None)
+
+
+def backend_model_name(backend: str) -> Optional[str]:
+    """Fixed model name of a self-contained backend, or None."""
+    return ENCODER_MODEL_NAMES.get(backend)
+
+
+def create_encoder(backend: str, model_name: str):
+    """Instantiate the encoder for a backend and model."""
+    factory = ENCODER_BACKENDS.get(backend)
+    if factory is None:
+        raise ValueError(f"Unknown encoder backend '{backend}'; "
+                         f"expected one of {', '.join(sorted(ENCODER_BACKENDS))}")
+    logger.info(f"Loading embedding model: {model_name} ({backend} backend)")
+    return factory(model_name)
+
+
+def _sentence_transformer_class():
+    """Import SentenceTransformer on first use; it pulls in torch, which takes seconds."""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        raise ImportError("sentence-transformers not available. Install with: pip install sentence-transformers")
+    return SentenceTransformer
+
+
+def torch_encoder(model_name: str):
+    """Full-precision PyTorch SentenceTransformer (the reference backend)."""
+    return _sentence_transformer_class()(model_name)
+
+
+def onnx_encoder(model_name: str):
+    """
+    SentenceTransformer running on ONNX Runtime.
+    
+    Needs sentence-transformers>=3.2 with optimum[onnxruntime]; the model is
+    exported to ONNX on first load if the hub repository has no export.
+    ENCODER_ONNX_FILE selects a specific file, such as a pre-quantised one.
+    """
+    model_kwargs = {'file_name': ENCODER_ONNX_FILE} if ENCODER_ONNX_FILE else None
+    return _sentence_transformer_class()(model_name, backend='onnx', model_kwargs=model_kwargs)
+
+
+def int8_encoder(model_name: str):
+    """PyTorch SentenceTransformer with int8 dynamic quantisation of its linear layers."""
+    model = _sentence_transformer_class()(model_name, device='cpu')
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+register_encoder("torch", torch_encoder)
+register_encoder("onnx", onnx_encoder)
+register_encoder("int8", int8_encoder)
+
+
+class HashedNgramEncoder:
+    """
+    Deterministic offline encoder built from hashed n-gram features.
+    
+    Word unigrams, word bigrams and character trigrams of each word are
+    hashed with CRC32 (stable across processes and platforms) into signed
+    buckets of a ``dimension``-wide vector, which is L2-normalised. Texts
+    sharing words or word fragments get similar vectors. It is not a
+    semantic model, but needs no download, so tests, benchmarks and
+    air-gapped sites can run the full index, search and hydration path.
+    """
+    
+    WORD_PATTERN = re.compile(r"[a-z0-9]+")
+    TRIGRAM_WEIGHT = 0.5
+    MAX_CACHED_WORDS = 1_000_000
+    
+    def __init__(self, dimension: int = EMBEDDING_DIMENSION):
+        self.dimension = dimension
+        self._features: Dict[str, Tuple[List[int], List[float]]] = {}  # Word -> (buckets, values)
+    
+    def _hash(self, feature: str) -> Tuple[int, float]:
+        h = zlib.crc32(feature.encode('utf-8'))
+        return h % self.dimension, (1.0 if h & 0x80000000 else -1.0)
+    
+    def _word_features(self, word: str) -> Tuple[List[int], List[float]]:
+        """Buckets and signed weights of a word and its character trigrams."""
+        cached = self._features.get(word)
+        if cached is not None:
+            return cached
+        
+        padded = f"<{word}>"
+        hashed = [self._hash(word)] + [self._hash(padded[i:i + 3]) for i in range(len(padded) - 2)]
+        buckets = [bucket for bucket, _ in hashed]
+        values = [sign * (1.0 if i == 0 else self.TRIGRAM_WEIGHT) for i, (_, sign) in enumerate(hashed)]
+        
+        if len(self._features) >= self.MAX_CACHED_WORDS:
+            self._features.clear()
+        self._features[word] = (buckets, values)
+        return buckets, values
+    
+    def encode(self, texts, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        """Encode a text or list of texts, like SentenceTransformer.encode."""
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = self.WORD_PATTERN.findall((text or '').lower())
+            buckets, values = [], []
+            for word in words:
+                word_buckets, word_values = self._word_features(word)
+                buckets.extend(word_buckets)
+                values.extend(word_values)
+            # Bigrams are too many to be worth caching
+            for bigram in map(' '.join, zip(words, words[1:])):
+                bucket, sign = self._hash(bigram)
+                buckets.append(bucket)
+                values.append(sign)
+            if buckets:
+                vectors[row] = np.bincount(buckets, weights=values, minlength=self.dimension)
+        
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors[0] if single else vectors
+
+
+def hashed_encoder(model_name: str):
+    """Offline HashedNgramEncoder; the model name is ignored."""
+    return HashedNgramEncoder()
+
+
+register_encoder("hashed", hashed_encoder, model_name=f"hashed-ngram-{EMBEDDING_DIMENSION}")
+
+
+def top_k_overlap(reference_queries: np.ndarray, reference_documents: np.ndarray,
+                  candidate_queries: np.ndarray, candidate_documents: np.ndarray,
+                  top_k: int) -> float:
+    """
+    Mean fraction of each query's top_k documents shared by two encoders.
+    
+    Each encoder ranks the same documents for the same queries by cosine
+    similarity of its own vectors; 1.0 means identical top-k sets.
+    """
+    def ranked(queries: np.ndarray, documents: np.ndarray) -> List[set]:
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        documents = documents / np.maximum(np.linalg.norm(documents, axis=1, keepdims=True), 1e-12)
+        scores = queries @ documents.T
+        k = min(top_k, documents.shape[0])
+        return [set(row) for row in np.argsort(-scores, axis=1, kind='stable')[:, :k].tolist()]
+    
+    reference = ranked(reference_queries, reference_documents)
+    candidate = ranked(candidate_queries, candidate_documents)
+    k = min(top_k, reference_documents.shape[0])
+    return float(np.mean([len(a & b) / k for a, b in zip(reference, candidate)]))
@@ -0,0 +1,58 @@
+"""Process-wide registry of shared search engines and databases."""
+
+import os
+import logging
+import threading
+from typing import Dict, Tuple
+
+from database import KnowledgeDatabase
+from search import SemanticSearchEngine
+
+logger = logging.getLogger(__name__)
+
+_engines: Dict[Tuple, SemanticSearchEngine] = {}
+_databases: Dict[Tuple, KnowledgeDatabase] = {}
+_lock = threading.Lock()
+
+
+def get_search_engine(model_name: str = None) -> SemanticSearchEngine:
+    """
+    Return the search engine shared by every session in this process.
+    
+    The engine is created on first use and loads its model and index
+    lazily on its first search. On each call the on-disk index files are
+    checked (a few stat calls) against the ones the engine read; when they
+    have been rebuilt or updated since, a fresh engine replaces it. The
+    loaded model and query embedding cache carry over, and searches already
+    running on the old engine finish against the index they started with.
+    An engine that has not read its index yet is kept.
+    """
+    key = (os.getpid(), model_name)
+    with _lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = SemanticSearchEngine(model_name)
+            _engines[key] = engine
+            return engine
+        
+        if engine.loaded_signature is None or engine.loaded_signature == engine.index_signature():
+            return engine
+        
+        logger.info("Search index changed on disk; reloading shared search engine")
+        replacement = SemanticSearchEngine(model_name)
+        replacement.model = engine.model
+        replacement.encoder_backend = engine.encoder_backend
+        replacement.query_cache = engine.query_cache
+        _engines[key] = replacement
+        return replacement
+
+
+def get_database() -> KnowledgeDatabase:
+    """Return the KnowledgeDatabase shared by every session in this process."""
+    key = (os.getpid(),)
+    with _lock:
+        db = _databases.get(key)
+        if db is None:
+            db = KnowledgeDatabase()
+            _databases[key] = db
+        return db
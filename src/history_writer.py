@@ -0,0 +1,152 @@
+"""Background writer batching search history inserts off the query path."""
+
+import os
+import queue
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Tuple
+
+from config.settings import (
+    HISTORY_FLUSH_INTERVAL_MS,
+    HISTORY_BATCH_SIZE,
+    HISTORY_QUEUE_SIZE,
+    HISTORY_ENQUEUE_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SearchHistoryWriter:
+    """
+    Queue search history rows and bulk-insert them from a daemon thread.
+    
+    Rows are written every HISTORY_FLUSH_INTERVAL_MS or HISTORY_BATCH_SIZE
+    rows, whichever comes first, with one commit per batch. The queue is
+    bounded: when it is full, record() blocks for up to
+    HISTORY_ENQUEUE_TIMEOUT seconds and then drops the row rather than
+    stalling searches. Pending rows are flushed at interpreter exit.
+    """
+    
+    def __init__(self, db, flush_interval_ms: int = None, batch_size: int = None,
+                 queue_size: int = None, enqueue_timeout: float = None):
+        self.db = db
+        self.flush_interval = (flush_interval_ms or HISTORY_FLUSH_INTERVAL_MS) / 1000
+        self.batch_size = batch_size or HISTORY_BATCH_SIZE
+        self.enqueue_timeout = HISTORY_ENQUEUE_TIMEOUT if enqueue_timeout is None else enqueue_timeout
+        self._queue = queue.Queue(maxsize=queue_size or HISTORY_QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+    
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='search-history-writer',
+                                                    daemon=True)
+                    self._thread.start()
+    
+    def record(self, query: str, results_count: int) -> bool:
+        """Queue one history row; returns False if it was dropped."""
+        if self._closed:
+            return False
+        self._ensure_thread()
+        # Same format as SQLite's CURRENT_TIMESTAMP, taken when the search ran
+        search_date = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            self._queue.put((query, results_count, search_date), timeout=self.enqueue_timeout)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            
+            batch = [item]
+            done = 1
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                done += 1
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            
+            self._write(batch)
+            for _ in range(done):
+                self._queue.task_done()
+            if stop:
+                return
+    
+    def _write(self, batch: List[Tuple[str, int, str]]):
+        try:
+            self.db.store_searches(batch)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.dropped += len(batch)
+            logger.error(f"Error writing search history: {str(e)}")
+    
+    def flush(self):
+        """Block until every queued row has been written."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+    
+    def close(self):
+        """Flush pending rows and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and write/drop counters."""
+        return {
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'batches': self.batches
+        }
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_history_writer(db) -> SearchHistoryWriter:
+    """Return the process-wide history writer for a database."""
+    key = (os.getpid(), db.db_path)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = SearchHistoryWriter(db)
+            _writers[key] = writer
+        return writer
+
+
+@atexit.register
+def _close_writers():
+    for (pid, _), writer in list(_writers.items()):
+        if pid == os.getpid():
+            writer.close()
@@ -0,0 +1,197 @@
+"""In-process BM25 inverted index for keyword search alongside FAISS."""
+
+import re
+import logging
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Word tokens; hyphen/slash/dot-joined identifiers such as project numbers
+# ("TKN-2024-SW-001") are kept whole as well as split into their parts
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_/.][a-z0-9]+)*")
+PART_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase text and split it into index terms."""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(PART_PATTERN.findall(token))
+    return tokens
+
+
+class BM25Index:
+    """
+    Compact BM25 inverted index over document text.
+    
+    Postings are stored in CSR form: the sorted term vocabulary indexes an
+    offsets array, and each term's postings are a contiguous slice of a
+    row array and a weight array. BM25 weights are precomputed at build
+    time, so a query is a handful of array slices and one accumulation.
+    The vocabulary is one buffer of concatenated UTF-8 terms with their
+    start offsets, so a long URL or path token costs only its own bytes.
+    """
+    
+    def __init__(self, term_bytes: np.ndarray, term_offsets: np.ndarray, offsets: np.ndarray,
+                 rows: np.ndarray, weights: np.ndarray, doc_ids: np.ndarray):
+        self.term_bytes = term_bytes      # Sorted vocabulary, UTF-8 terms back to back (uint8)
+        self.term_offsets = term_offsets  # Term i is term_bytes[term_offsets[i]:term_offsets[i + 1]]
+        self.offsets = offsets  # Postings of term i are rows/weights[offsets[i]:offsets[i + 1]]
+        self.rows = rows        # Postings: row into doc_ids
+        self.weights = weights  # Postings: precomputed BM25 term weight
+        self.doc_ids = doc_ids  # Document ID of each row
+    
+    @classmethod
+    def build(cls, documents: Iterable[Tuple[int, str]], k1: float = 1.2,
+              b: float = 0.75) -> 'BM25Index':
+        """Build an index from (document ID, text) pairs."""
+        vocabulary = {}
+        doc_ids = []
+        lengths = []
+        token_ids = []  # Term ID of every token in the corpus, document by document
+        for doc_id, text in documents:
+            tokens = [vocabulary.setdefault(token, len(vocabulary)) for token in tokenize(text or '')]
+            doc_ids.append(doc_id)
+            lengths.append(len(tokens))
+            token_ids.extend(tokens)
+        
+        # Renumber terms in sorted order so the vocabulary can be binary
+        # searched; code point order is also UTF-8 byte order
+        terms = list(vocabulary)
+        term_order = sorted(range(len(terms)), key=terms.__getitem__)
+        term_rank = np.empty(len(terms), dtype=np.int64)
+        term_rank[term_order] = np.arange(len(terms))
+        term_bytes, term_offsets = cls._pack_terms([terms[i] for i in term_order])
+        
+        # One (term, row) key per token; counting unique keys yields sorted
+        # postings with their term frequencies
+        n_docs = len(doc_ids)
+        token_rows = np.repeat(np.arange(n_docs, dtype=np.int64), lengths)
+        keys = term_rank[np.array(token_ids, dtype=np.int64)] * max(n_docs, 1) + token_rows
+        keys, tf = np.unique(keys, return_counts=True)
+        posting_terms = keys // max(n_docs, 1)
+        rows = (keys % max(n_docs, 1)).astype(np.int32)
+        tf = tf.astype(np.float32)
+        
+        df = np.bincount(posting_terms, minlength=len(terms))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(df, out=offsets[1:])
+        
+        lengths = np.array(lengths, dtype=np.float32)
+        avg_length = float(lengths.mean()) if lengths.sum() > 0 else 1.0
+        idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = k1 * (1 - b + b * lengths[rows] / avg_length)
+        weights = np.repeat(idf, df) * tf * (k1 + 1) / (tf + norm)
+        
+        return cls(term_bytes, term_offsets, offsets, rows, weights.astype(np.float32),
+                   np.array(doc_ids, dtype=np.int64))
+    
+    @staticmethod
+    def _pack_terms(terms: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Concatenate sorted terms into a UTF-8 byte buffer and start offsets."""
+        encoded = [term.encode('utf-8') for term in terms]
+        term_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(term) for term in encoded], out=term_offsets[1:])
+        return np.frombuffer(b''.join(encoded), dtype=np.uint8), term_offsets
+    
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+    
+    def save(self, path: Path):
+        """Write the index arrays to a single .npz file."""
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, term_bytes=self.term_bytes, term_offsets=self.term_offsets,
+                     offsets=self.offsets, rows=self.rows, weights=self.weights,
+                     doc_ids=self.doc_ids)
+        tmp_path.replace(path)
+    
+    @classmethod
+    def load(cls, path: Path) -> 'BM25Index':
+        """Read an index written by save()."""
+        with np.load(path) as data:
+            if 'term_bytes' in data:
+                term_bytes, term_offsets = data['term_bytes'], data['term_offsets']
+            else:
+                # Indexes saved before the packed vocabulary hold a unicode array
+                term_bytes, term_offsets = cls._pack_terms(data['terms'].tolist())
+            return cls(term_bytes, term_offsets, data['offsets'], data['rows'],
+                       data['weights'], data['doc_ids'])
+    
+    def _term_slices(self, query: str) -> List[Tuple[int, int]]:
+        """Postings ranges of the distinct query terms present in the vocabulary."""
+        if len(self.term_offsets) <= 1:
+            return []
+        
+        # Look up each compound identifier whole; its parts (e.g. "tkn" of a
+        # project number, matching every document) are only a fallback
+        query_terms = []
+        for match in TOKEN_PATTERN.finditer(query.lower()):
+            token = match.group()
+            if token.isalnum() or self._find(token) is not None:
+                query_terms.append(token)
+            else:
+                query_terms.extend(PART_PATTERN.findall(token))
+        
+        slices = []
+        for term in sorted(set(query_terms)):
+            position = self._find(term)
+            if position is not None:
+                slices.append((int(self.offsets[position]), int(self.offsets[position + 1])))
+        return slices
+    
+    def _term(self, position: int) -> bytes:
+        return self.term_bytes[self.term_offsets[position]:self.term_offsets[position + 1]].tobytes()
+    
+    def _find(self, term: str):
+        """Vocabulary position of a term, or None."""
+        target = term.encode('utf-8')
+        low, high = 0, len(self.term_offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self._term(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self.term_offsets) - 1 and self._term(low) == target:
+            return low
+        return None
+    
+    def search(self, query: str, top_k: int,
+               allowed_ids: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (document IDs, BM25 scores) of the top_k matches, best first.
+        
+        ``allowed_ids`` restricts matches to the given document IDs.
+        """
+        slices = self._term_slices(query)
+        if not slices:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        
+        # A term's postings hold each row at most once, so plain fancy-index
+        # accumulation is exact
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        for start, end in slices:
+            scores[self.rows[start:end]] += self.weights[start:end]
+        
+        # Rank only the matched rows unless the query touches most of the corpus
+        n_postings = sum(end - start for start, end in slices)
+        if n_postings < len(scores) // 4:
+            candidates = np.unique(np.concatenate([self.rows[s:e] for s, e in slices]))
+            candidates = candidates[scores[candidates] > 0]
+        else:
+            candidates = np.flatnonzero(scores > 0)
+        
+        if allowed_ids is not None:
+            candidates = candidates[np.isin(self.doc_ids[candidates], allowed_ids)]
+        
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        order = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return self.doc_ids[order], scores[order]
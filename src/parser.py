@@ -19,6 +19,7 @@ except ImportError:
     PyPDF2 = None
 
 from config.settings import SF84_HEADER_FIELDS, SF84_SECTIONS
+from utils import compute_file_hash
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -34,6 +35,7 @@ class SF84Document:
     file_size: int
     created_date: Optional[datetime] = None
     modified_date: Optional[datetime] = None
+    content_hash: Optional[str] = None
     
     # Header fields
     project_name: Optional[str] = None
@@ -129,7 +131,8 @@ class DocumentParser:
                 file_name=file_path_obj.name,
                 file_size=file_stats.st_size,
                 created_date=datetime.fromtimestamp(file_stats.st_ctime),
-                modified_date=datetime.fromtimestamp(file_stats.st_mtime)
+                modified_date=datetime.fromtimestamp(file_stats.st_mtime),
+                content_hash=compute_file_hash(file_path)
             )
             
             # Parse based on file type
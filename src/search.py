@@ -1,59 +1,247 @@
 """Semantic search engine using sentence-transformers and FAISS."""
 
 import os
+import time
 import pickle
+import threading
+import json
+import hashlib
 import numpy as np
 import logging
 from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 
-try:
-    from sentence_transformers import SentenceTransformer
-except ImportError:
-    SentenceTransformer = None
-
-try:
-    import faiss
-except ImportError:
-    faiss = None
+# faiss takes seconds to import, so _import_faiss() imports it on first
+# use; it stays None until then, or when faiss-cpu is not installed. The
+# encoder backends likewise import sentence-transformers (torch) lazily.
+faiss = None
 
 from config.settings import (
     EMBEDDING_MODEL, 
     EMBEDDING_DIMENSION, 
     EMBEDDINGS_DIR, 
+    ENCODER_BACKEND,
+    ENCODER_PARITY_CHECK,
+    ENCODER_PARITY_SAMPLE,
+    ENCODER_PARITY_TOP_K,
+    ENCODER_PARITY_MIN_OVERLAP,
     MAX_SEARCH_RESULTS,
-    SIMILARITY_THRESHOLD
+    SIMILARITY_THRESHOLDS,
+    SEARCH_METRIC,
+    SEARCH_INDEX_TYPE,
+    INDEX_FLAT_MAX_VECTORS,
+    INDEX_IVF_FLAT_MAX_VECTORS,
+    INDEX_TRAIN_SAMPLE_SIZE,
+    IVF_NLIST,
+    IVF_NPROBE,
+    IVF_PQ_M,
+    HNSW_M,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    SEARCH_HYBRID,
+    HYBRID_CANDIDATES,
+    RRF_K,
+    BM25_K1,
+    BM25_B,
+    FILTER_EXACT_MAX_VECTORS,
+    QUERY_CACHE_SIZE,
+    QUERY_CACHE_DISK_TIER,
+    RESULT_CACHE_SIZE,
+    QUERY_BATCHING,
+    QUERY_BATCH_MAX_SIZE,
+    QUERY_BATCH_WAIT_MS,
+    WARMUP_QUERY,
+    SEARCH_HISTORY_ASYNC,
+    SEARCH_USE_CHUNKS,
+    CHUNK_SECTIONS,
+    CHUNK_MAX_WORDS,
+    CHUNK_OVERLAP_WORDS,
+    CHUNK_POOLING,
+    CHUNK_OVERSAMPLE
 )
 from database import KnowledgeDatabase
+from embedding_cache import EmbeddingCache
+from encoders import REFERENCE_BACKEND, backend_model_name, create_encoder, top_k_overlap
+from history_writer import get_history_writer
+from lexical_index import BM25Index
+from utils import LRUCache, MicroBatcher, normalize_query, extract_snippet
 
 logger = logging.getLogger(__name__)
 
+def _import_faiss():
+    """Import faiss on first use; returns None if unavailable."""
+    global faiss
+    if faiss is None:
+        try:
+            import faiss
+        except ImportError:
+            return None
+    return faiss
+
+
+# Chunk index label -> owning document and section, stored as one .npy record array
+CHUNK_MAP_DTYPE = np.dtype([('id', '<i8'), ('document_id', '<i8'), ('section', '<U64')])
+
 
 class SemanticSearchEngine:
     """Semantic search engine for finding similar documents."""
     
-    def __init__(self, model_name: str = None):
-        self.model_name = model_name or EMBEDDING_MODEL
+    def __init__(self, model_name: str = None, db: KnowledgeDatabase = None):
+        self.encoder_backend = ENCODER_BACKEND  # Falls back to REFERENCE_BACKEND if parity fails
+        self.model_name = model_name or backend_model_name(ENCODER_BACKEND) or EMBEDDING_MODEL
+        self.metric = SEARCH_METRIC
+        self.index_type = SEARCH_INDEX_TYPE
         self.model = None
+        self.encoder_parity_file = EMBEDDINGS_DIR / "encoder_parity.json"
         self.index = None
-        self.document_map = {}  # Maps index positions to document IDs
-        self.embeddings_file = EMBEDDINGS_DIR / "document_embeddings.pkl"
+        self.index_writable = False  # False when the index is memory-mapped read-only
+        self.labels_are_ids = False  # True when FAISS labels are document IDs
+        self.embeddings = None  # float32 (N, dim) model vectors, memory-mapped when loaded
+        self.document_ids = np.zeros(0, dtype=np.int64)  # Document ID of each embeddings row
+        self.embeddings_file = EMBEDDINGS_DIR / "document_embeddings.npy"
+        self.ids_file = EMBEDDINGS_DIR / "document_ids.npy"
         self.index_file = EMBEDDINGS_DIR / "faiss_index.bin"
-        self.map_file = EMBEDDINGS_DIR / "document_map.pkl"
+        self.manifest_file = EMBEDDINGS_DIR / "index_manifest.json"
+        self.legacy_map_file = EMBEDDINGS_DIR / "document_map.pkl"  # Pickled position -> ID map
+        self.fingerprints = {}  # Maps document IDs to content hashes of indexed text
+        self.fingerprint_model = None
+        self.index_model = None  # Model whose vectors the loaded index holds
+        self.chunk_index = None
+        self.chunk_index_model = None  # Model whose vectors the loaded chunk index holds
+        self.chunk_map = np.zeros(0, dtype=CHUNK_MAP_DTYPE)  # Sorted by chunk ID
+        self.chunk_index_file = EMBEDDINGS_DIR / "chunk_index.bin"
+        self.chunk_map_file = EMBEDDINGS_DIR / "chunk_map.npy"
+        self.chunk_manifest_file = EMBEDDINGS_DIR / "chunk_manifest.json"
+        self.lexical_index = None  # BM25 keyword index fused with semantic hits
+        self.lexical_index_file = EMBEDDINGS_DIR / "lexical_index.npz"
+        self.id_sorter = None  # (index generation, argsort of document_ids)
+        self.embedding_cache = None  # Opened lazily on first document encode
+        self.query_cache = LRUCache(QUERY_CACHE_SIZE)  # Normalised query -> embedding
+        self.query_disk_hits = 0
+        self.result_cache = LRUCache(RESULT_CACHE_SIZE)  # Search key -> ranked results
+        # Concurrent searches share model.encode and index.search calls
+        batch_size = QUERY_BATCH_MAX_SIZE if QUERY_BATCHING else 1
+        batch_wait = QUERY_BATCH_WAIT_MS if QUERY_BATCHING else 0
+        self.encode_batcher = MicroBatcher(self._encode_batch, batch_size, batch_wait)
+        self.search_batcher = MicroBatcher(self._search_batch, batch_size, batch_wait)
+        self.index_generation = 0  # Bumped whenever the in-memory index changes
+        self.loaded_signature = None  # index_signature() when index files were last read or written
+        self.filter_columns = None  # Columnar trust/category/region arrays for filtering
+        self._load_lock = threading.RLock()  # Serialises model and index loads across threads
         
-        self.db = KnowledgeDatabase()
+        self.db = db or KnowledgeDatabase()
         
         # Ensure embeddings directory exists
         EMBEDDINGS_DIR.mkdir(parents=True, exist_ok=True)
     
     def _load_model(self):
-        """Load the sentence transformer model."""
-        if self.model is None:
-            if SentenceTransformer is None:
-                raise ImportError("sentence-transformers not available. Install with: pip install sentence-transformers")
+        """
+        Load the sentence encoder for the configured backend.
+        
+        A backend other than the reference one is only loaded if it has a
+        passing parity result on record (see verify_encoder_backend);
+        otherwise the reference backend is used. No parity check runs here,
+        on the query path.
+        """
+        if self.model is not None:
+            return
+        with self._load_lock:
+            if self.model is not None:
+                return  # Loaded by another thread while this one waited
+            if not self._encoder_backend_verified():
+                logger.warning(f"Encoder backend '{self.encoder_backend}' has not passed the parity "
+                               f"check; using '{REFERENCE_BACKEND}'")
+                self.encoder_backend = REFERENCE_BACKEND
+            self.model = create_encoder(self.encoder_backend, self.model_name)
+    
+    @property
+    def encoder_key(self) -> str:
+        """Embedding cache key for the model and backend producing vectors."""
+        if (self.encoder_backend == REFERENCE_BACKEND
+                or backend_model_name(self.encoder_backend) is not None):
+            return self.model_name
+        return f"{self.model_name}:{self.encoder_backend}"
+    
+    def _parity_key(self) -> str:
+        return f"{self.model_name}:{self.encoder_backend}"
+    
+    def _read_parity_results(self) -> Dict[str, Any]:
+        """Recorded parity results from encoder_parity.json, or {} if unreadable."""
+        if not self.encoder_parity_file.exists():
+            return {}
+        try:
+            with open(self.encoder_parity_file) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read encoder parity results: {str(e)}")
+            return {}
+    
+    def _encoder_backend_verified(self) -> bool:
+        """Whether the configured backend may be used without a parity check now."""
+        if (self.encoder_backend == REFERENCE_BACKEND or not ENCODER_PARITY_CHECK
+                or backend_model_name(self.encoder_backend) is not None):
+            return True
+        result = self._read_parity_results().get(self._parity_key())
+        return result is not None and result['overlap'] >= ENCODER_PARITY_MIN_OVERLAP
+    
+    def verify_encoder_backend(self) -> bool:
+        """
+        Check the configured encoder backend against the reference backend.
+        
+        Runs at ingest and at API warm-up, never on the query path: it loads
+        the reference model and encodes a sample of indexed documents,
+        queried by recent searches and by their own project names, with both
+        encoders. The backend passes when the mean top-k overlap reaches
+        ENCODER_PARITY_MIN_OVERLAP. The measurement is recorded in
+        encoder_parity.json and reused by later processes; a result that
+        cannot be recorded, or too few documents to compare, counts as not
+        verified. Returns whether the backend will be used.
+        """
+        if self._encoder_backend_verified():
+            return True
+        with self._load_lock:
+            if self.model is not None or self._parity_key() in self._read_parity_results():
+                return False  # Already fell back, or measured and failed
+            
+            doc_ids = [row[0] for row in self.db.get_filter_metadata()]
+            if len(doc_ids) <= ENCODER_PARITY_TOP_K:
+                logger.warning("Too few documents to check encoder parity")
+                return False
+            step = max(1, len(doc_ids) // ENCODER_PARITY_SAMPLE)
+            documents = self.db.get_documents(doc_ids[::step][:ENCODER_PARITY_SAMPLE])
+            texts = [self._document_text(doc) for doc in documents]
+            queries = [row['query'] for row in self.db.get_search_history(ENCODER_PARITY_SAMPLE)]
+            queries = list(dict.fromkeys(queries + [doc['project_name'] for doc in documents
+                                                    if doc.get('project_name')]))
             
-            logger.info(f"Loading embedding model: {self.model_name}")
-            self.model = SentenceTransformer(self.model_name)
+            encoder = create_encoder(self.encoder_backend, self.model_name)
+            reference = create_encoder(REFERENCE_BACKEND, self.model_name)
+            overlap = top_k_overlap(
+                reference.encode(queries, convert_to_numpy=True),
+                reference.encode(texts, convert_to_numpy=True),
+                encoder.encode(queries, convert_to_numpy=True),
+                encoder.encode(texts, convert_to_numpy=True),
+                ENCODER_PARITY_TOP_K
+            )
+            logger.info(f"Encoder backend '{self.encoder_backend}' top-{ENCODER_PARITY_TOP_K} overlap "
+                        f"with '{REFERENCE_BACKEND}': {overlap:.3f} over {len(queries)} queries")
+            
+            results = self._read_parity_results()
+            results[self._parity_key()] = {'overlap': overlap, 'queries': len(queries),
+                                           'documents': len(texts)}
+            try:
+                tmp_path = self.encoder_parity_file.with_name(self.encoder_parity_file.name + '.tmp')
+                with open(tmp_path, 'w') as f:
+                    json.dump(results, f, indent=2)
+                os.replace(tmp_path, self.encoder_parity_file)
+            except OSError as e:
+                logger.warning(f"Could not record encoder parity result: {str(e)}")
+                return False
+            
+            if overlap < ENCODER_PARITY_MIN_OVERLAP:
+                return False
+            self.model = encoder
+            return True
     
     def _encode_text(self, text: str) -> np.ndarray:
         """Encode text into embedding vector."""
@@ -65,8 +253,179 @@ class SemanticSearchEngine:
         self._load_model()
         return self.model.encode(texts, convert_to_numpy=True)
     
-    def create_embeddings_for_documents(self, force_rebuild: bool = False) -> bool:
-        """Create embeddings for all documents in the database."""
+    def _encode_batch(self, texts: List[str]) -> List[np.ndarray]:
+        """Encode coalesced queries with one model call (MicroBatcher callback)."""
+        return list(self._encode_texts(texts))
+    
+    def _encode_query(self, query: str) -> np.ndarray:
+        """
+        Encode a search query, serving repeated queries from cache.
+        
+        Queries are normalised (case, whitespace) before lookup; a hit in the
+        in-process LRU or the optional on-disk tier skips model inference.
+        """
+        key = normalize_query(query)
+        vector = self.query_cache.get(key)
+        if vector is not None:
+            return vector
+        
+        cache = self._get_embedding_cache() if QUERY_CACHE_DISK_TIER else None
+        if cache is not None:
+            try:
+                vector = cache.get_many(self.encoder_key, [key])[0]
+            except Exception as e:
+                logger.warning(f"Embedding cache lookup failed: {str(e)}")
+            if vector is not None:
+                self.query_disk_hits += 1
+        
+        if vector is None:
+            # Coalesced with concurrent queries into one model.encode call
+            vector = np.asarray(self.encode_batcher.submit(key), dtype='float32')
+            if cache is not None:
+                try:
+                    cache.put_many(self.encoder_key, [key], vector.reshape(1, -1))
+                except Exception as e:
+                    logger.warning(f"Embedding cache update failed: {str(e)}")
+        
+        vector.setflags(write=False)  # Shared between callers via the cache
+        self.query_cache.put(key, vector)
+        return vector
+    
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Encode many search queries, with one model call for all cache misses.
+        
+        Uses the same normalisation and caches as _encode_query.
+        """
+        keys = [normalize_query(query) for query in queries]
+        vectors = {}
+        for key in keys:
+            vector = self.query_cache.get(key)
+            if vector is not None:
+                vectors[key] = vector
+        
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        cache = self._get_embedding_cache() if QUERY_CACHE_DISK_TIER and missing else None
+        if cache is not None:
+            try:
+                for key, vector in zip(missing, cache.get_many(self.encoder_key, missing)):
+                    if vector is not None:
+                        vectors[key] = vector
+                        self.query_disk_hits += 1
+            except Exception as e:
+                logger.warning(f"Embedding cache lookup failed: {str(e)}")
+            missing = [key for key in missing if key not in vectors]
+        
+        if missing:
+            encoded = np.asarray(self._encode_texts(missing), dtype='float32')
+            if cache is not None:
+                try:
+                    cache.put_many(self.encoder_key, missing, encoded)
+                except Exception as e:
+                    logger.warning(f"Embedding cache update failed: {str(e)}")
+            for key, vector in zip(missing, encoded):
+                vectors[key] = vector
+        
+        for key in dict.fromkeys(keys):
+            vector = vectors[key]
+            if vector.flags.writeable:
+                vector = vector.copy()
+                vector.setflags(write=False)  # Shared between callers via the cache
+                vectors[key] = vector
+            self.query_cache.put(key, vector)
+        return np.vstack([vectors[key] for key in keys])
+    
+    def _get_embedding_cache(self) -> Optional[EmbeddingCache]:
+        """Open the persistent embedding cache, or None if it is unavailable."""
+        if self.embedding_cache is None:
+            try:
+                self.embedding_cache = EmbeddingCache()
+            except Exception as e:
+                logger.warning(f"Embedding cache unavailable: {str(e)}")
+        return self.embedding_cache
+    
+    def _encode_documents(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode document texts, reusing cached vectors where possible.
+        
+        Only texts missing from the embedding cache for the current model are
+        sent to the model; their vectors are then added to the cache.
+        """
+        cache = self._get_embedding_cache()
+        if cache is None:
+            return self._encode_texts(texts)
+        
+        try:
+            cached = cache.get_many(self.encoder_key, texts)
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed: {str(e)}")
+            return self._encode_texts(texts)
+        
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        logger.info(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} to encode")
+        
+        if missing:
+            encoded = self._encode_texts([texts[i] for i in missing])
+            for i, vector in zip(missing, encoded):
+                cached[i] = vector
+            try:
+                cache.put_many(self.encoder_key, [texts[i] for i in missing], encoded)
+            except Exception as e:
+                logger.warning(f"Embedding cache update failed: {str(e)}")
+        
+        return np.vstack(cached).astype('float32')
+    
+    @staticmethod
+    def _document_text(doc: Dict[str, Any]) -> str:
+        """Return the text to embed for a document."""
+        searchable_text = doc.get('searchable_text', '')
+        if not searchable_text:
+            # Try to construct searchable text from available fields
+            text_parts = []
+            for field in ['project_name', 'background', 'scope_of_work', 'deliverables']:
+                value = doc.get(field, '')
+                if value:
+                    text_parts.append(str(value))
+            searchable_text = ' '.join(text_parts)
+        return searchable_text
+    
+    @classmethod
+    def _lexical_text(cls, doc: Dict[str, Any]) -> str:
+        """Return the text to keyword-index: embedded text plus people's names."""
+        parts = [cls._document_text(doc)]
+        for field in ['project_number', 'project_leader', 'project_reviewer', 'client_representative']:
+            value = doc.get(field)
+            if value:
+                parts.append(str(value))
+        return ' '.join(parts)
+    
+    def _collect_document_texts(self) -> Dict[int, str]:
+        """Map document ID -> embeddable text for every indexable document."""
+        texts = {}
+        for doc in self.db.get_all_documents():
+            searchable_text = self._document_text(doc)
+            if searchable_text and len(searchable_text.strip()) > 10:  # Minimum text length
+                texts[doc['id']] = searchable_text
+        return texts
+    
+    @staticmethod
+    def _fingerprint(text: str) -> str:
+        """Content hash used to detect documents whose text changed."""
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+    
+    def create_embeddings_for_documents(self, force_rebuild: bool = False,
+                                        incremental: bool = False) -> bool:
+        """
+        Create embeddings for all documents in the database.
+        
+        Args:
+            force_rebuild: Re-encode every document and rebuild the index
+            incremental: Bring an existing index up to date by encoding only
+                added or changed documents and removing deleted ones
+        """
+        if incremental and not force_rebuild and self._embeddings_exist():
+            return self.update_embeddings()
+        
         if not force_rebuild and self._embeddings_exist():
             logger.info("Embeddings already exist. Use force_rebuild=True to recreate.")
             return True
@@ -74,54 +433,28 @@ class SemanticSearchEngine:
         logger.info("Creating embeddings for all documents...")
         
         # Get all documents
-        documents = self.db.get_all_documents()
-        if not documents:
-            logger.warning("No documents found in database")
-            return False
-        
-        # Prepare texts for embedding
-        texts = []
-        doc_ids = []
-        valid_docs = []
-        
-        for doc in documents:
-            searchable_text = doc.get('searchable_text', '')
-            if not searchable_text:
-                # Try to construct searchable text from available fields
-                text_parts = []
-                for field in ['project_name', 'background', 'scope_of_work', 'deliverables']:
-                    value = doc.get(field, '')
-                    if value:
-                        text_parts.append(str(value))
-                searchable_text = ' '.join(text_parts)
-            
-            if searchable_text and len(searchable_text.strip()) > 10:  # Minimum text length
-                texts.append(searchable_text)
-                doc_ids.append(doc['id'])
-                valid_docs.append(doc)
-        
-        if not texts:
+        document_texts = self._collect_document_texts()
+        if not document_texts:
             logger.error("No valid text content found in documents")
             return False
         
+        doc_ids = list(document_texts.keys())
+        texts = list(document_texts.values())
+        
         try:
             # Generate embeddings
             logger.info(f"Generating embeddings for {len(texts)} documents...")
-            embeddings = self._encode_texts(texts)
+            embeddings = self._encode_documents(texts)
             
             # Create FAISS index
-            if faiss is None:
+            if _import_faiss() is None:
                 raise ImportError("faiss-cpu not available. Install with: pip install faiss-cpu")
             
-            dimension = embeddings.shape[1]
-            index = faiss.IndexFlatL2(dimension)  # L2 (Euclidean) distance
-            index.add(embeddings.astype('float32'))
-            
-            # Create document mapping (index position -> document ID)
-            document_map = {i: doc_id for i, doc_id in enumerate(doc_ids)}
+            index = self._build_index(self._prepare_vectors(embeddings), doc_ids)
+            fingerprints = {doc_id: self._fingerprint(text) for doc_id, text in document_texts.items()}
             
             # Save everything
-            self._save_embeddings(embeddings, index, document_map)
+            self._save_embeddings(embeddings, index, doc_ids, fingerprints)
             
             logger.info(f"Successfully created embeddings for {len(texts)} documents")
             return True
@@ -130,108 +463,1044 @@ class SemanticSearchEngine:
             logger.error(f"Error creating embeddings: {str(e)}")
             return False
     
-    def _embeddings_exist(self) -> bool:
-        """Check if embeddings files exist."""
-        return (self.embeddings_file.exists() and 
-                self.index_file.exists() and 
-                self.map_file.exists())
-    
-    def _save_embeddings(self, embeddings: np.ndarray, index, document_map: Dict[int, int]):
-        """Save embeddings, FAISS index, and document mapping to disk."""
-        # Save embeddings
-        with open(self.embeddings_file, 'wb') as f:
-            pickle.dump(embeddings, f)
+    def update_embeddings(self) -> bool:
+        """
+        Incrementally sync the index with the documents table.
         
-        # Save FAISS index
-        faiss.write_index(index, str(self.index_file))
+        Only documents that are new or whose text changed since the last build
+        are encoded; vectors for changed or deleted documents are removed.
+        Falls back to a full rebuild for indexes that cannot be updated in place.
+        """
+        if not self._load_embeddings(writable=True):
+            return self.create_embeddings_for_documents(force_rebuild=True)
         
-        # Save document mapping
-        with open(self.map_file, 'wb') as f:
-            pickle.dump(document_map, f)
+        if (not self.labels_are_ids or self.embeddings is None
+                or self.fingerprint_model != self.model_name
+                or self._index_metric(self.index) != self.metric):
+            logger.info("Existing index does not support incremental updates; rebuilding")
+            return self.create_embeddings_for_documents(force_rebuild=True)
+        
+        document_texts = self._collect_document_texts()
+        current = {doc_id: self._fingerprint(text) for doc_id, text in document_texts.items()}
+        
+        # The corpus may have grown (or shrunk) into a different index tier
+        if self._index_kind(self.index) != self._select_index_type(len(current)):
+            logger.info("Corpus size calls for a different index type; rebuilding")
+            return self.create_embeddings_for_documents(force_rebuild=True)
+        
+        stale_ids = [doc_id for doc_id, fingerprint in self.fingerprints.items()
+                     if current.get(doc_id) != fingerprint]
+        new_ids = [doc_id for doc_id, fingerprint in current.items()
+                   if self.fingerprints.get(doc_id) != fingerprint]
+        
+        if not stale_ids and not new_ids:
+            logger.info("Search index is up to date")
+            return True
         
-        # Update instance variables
-        self.index = index
-        self.document_map = document_map
-    
-    def _load_embeddings(self) -> bool:
-        """Load embeddings, FAISS index, and document mapping from disk."""
         try:
-            if not self._embeddings_exist():
-                return False
+            index = self.index
+            fingerprints = dict(self.fingerprints)
+            keep = np.ones(len(self.document_ids), dtype=bool)
+            
+            if stale_ids:
+                try:
+                    index.remove_ids(np.array(stale_ids, dtype='int64'))
+                except RuntimeError:
+                    # e.g. HNSW graphs cannot drop vectors
+                    logger.info("Index type does not support removal; rebuilding")
+                    return self.create_embeddings_for_documents(force_rebuild=True)
+                keep = ~np.isin(self.document_ids, stale_ids)
+                for doc_id in stale_ids:
+                    fingerprints.pop(doc_id, None)
             
-            # Load FAISS index
-            if faiss is None:
-                raise ImportError("faiss-cpu not available")
+            doc_ids = self.document_ids[keep]
+            embeddings = self.embeddings[keep]
             
-            self.index = faiss.read_index(str(self.index_file))
+            if new_ids:
+                logger.info(f"Generating embeddings for {len(new_ids)} new or changed documents...")
+                new_embeddings = self._encode_documents([document_texts[doc_id] for doc_id in new_ids])
+                index.add_with_ids(self._prepare_vectors(new_embeddings), np.array(new_ids, dtype='int64'))
+                doc_ids = np.concatenate([doc_ids, np.array(new_ids, dtype='int64')])
+                embeddings = np.vstack([embeddings, new_embeddings.astype('float32')])
+                for doc_id in new_ids:
+                    fingerprints[doc_id] = current[doc_id]
             
-            # Load document mapping
-            with open(self.map_file, 'rb') as f:
-                self.document_map = pickle.load(f)
+            self._save_embeddings(embeddings, index, doc_ids, fingerprints)
             
-            logger.info(f"Loaded embeddings for {len(self.document_map)} documents")
+            removed = len(set(stale_ids) - set(new_ids))
+            logger.info(f"Index updated: {len(new_ids)} encoded, {removed} removed, "
+                        f"{index.ntotal} total")
             return True
             
         except Exception as e:
-            logger.error(f"Error loading embeddings: {str(e)}")
+            logger.error(f"Error updating embeddings: {str(e)}")
             return False
     
-    def search(self, query: str, top_k: int = None, threshold: float = None) -> List[Dict[str, Any]]:
-        """Perform semantic search for similar documents."""
-        top_k = top_k or MAX_SEARCH_RESULTS
-        threshold = threshold or SIMILARITY_THRESHOLD
+    def remove_documents(self, doc_ids: List[int]) -> int:
+        """Remove vectors for the given document IDs from the index."""
+        if not self.index_writable and not self._load_embeddings(writable=True):
+            return 0
         
-        # Load embeddings if not already loaded
-        if self.index is None:
-            if not self._load_embeddings():
-                logger.error("No embeddings found. Please create embeddings first.")
-                return []
+        if not self.labels_are_ids or self.embeddings is None:
+            logger.warning("Index is not ID-mapped; rebuild it to remove documents")
+            return 0
         
+        doc_ids = {int(doc_id) for doc_id in doc_ids}
         try:
-            # Encode query
-            query_embedding = self._encode_text(query)
+            removed = int(self.index.remove_ids(np.array(sorted(doc_ids), dtype='int64')))
+        except RuntimeError:
+            logger.warning("Index type does not support removal; rebuild it to remove documents")
+            return 0
+        if removed:
+            keep = ~np.isin(self.document_ids, list(doc_ids))
+            fingerprints = {k: v for k, v in self.fingerprints.items() if k not in doc_ids}
+            self._save_embeddings(self.embeddings[keep], self.index,
+                                  self.document_ids[keep], fingerprints)
+        return removed
+    
+    def _select_index_type(self, n_vectors: int) -> str:
+        """Resolve SEARCH_INDEX_TYPE, choosing a tier by corpus size for 'auto'."""
+        index_type = self.index_type
+        if index_type == 'auto':
+            if n_vectors <= INDEX_FLAT_MAX_VECTORS:
+                index_type = 'flat'
+            elif n_vectors <= INDEX_IVF_FLAT_MAX_VECTORS:
+                index_type = 'ivf_flat'
+            else:
+                index_type = 'ivf_pq'
+        
+        # PQ codebooks need ~39 training points per centroid (256 per sub-quantizer)
+        if index_type == 'ivf_pq' and n_vectors < 256 * 39:
+            logger.warning(f"Too few vectors ({n_vectors}) to train IVF-PQ; using IVF-Flat")
+            index_type = 'ivf_flat'
+        return index_type
+    
+    def _build_index(self, vectors: np.ndarray, doc_ids: List[int]):
+        """
+        Create, train and fill an index for prepared vectors keyed by document ID.
+        
+        ``l2`` uses Euclidean distance; ``cosine`` uses inner product over
+        L2-normalised vectors. Flat and HNSW indexes are wrapped in an ID map;
+        IVF indexes store document IDs natively, with a hashtable direct map
+        so vectors can be reconstructed and removed by ID.
+        """
+        n_vectors, dimension = vectors.shape
+        index_type = self._select_index_type(n_vectors)
+        metric = faiss.METRIC_INNER_PRODUCT if self.metric == 'cosine' else faiss.METRIC_L2
+        
+        if index_type in ('ivf_flat', 'ivf_pq'):
+            nlist = IVF_NLIST or int(4 * np.sqrt(n_vectors))
+            nlist = max(1, min(nlist, n_vectors // 39))
+            encoding = f"PQ{IVF_PQ_M}" if index_type == 'ivf_pq' else "Flat"
+            index = faiss.index_factory(dimension, f"IVF{nlist},{encoding}", metric)
             
-            # Search FAISS index
-            distances, indices = self.index.search(
-                query_embedding.reshape(1, -1).astype('float32'), 
-                top_k
+            # Train on a random sample; large corpora do not need every vector
+            sample = vectors
+            if n_vectors > INDEX_TRAIN_SAMPLE_SIZE:
+                rng = np.random.default_rng(0)
+                sample = vectors[rng.choice(n_vectors, INDEX_TRAIN_SAMPLE_SIZE, replace=False)]
+            logger.info(f"Training {index_type} index (nlist={nlist}) on {len(sample)} vectors...")
+            index.train(sample)
+            faiss.extract_index_ivf(index).set_direct_map_type(faiss.DirectMap.Hashtable)
+        elif index_type == 'hnsw':
+            base = faiss.IndexHNSWFlat(dimension, HNSW_M, metric)
+            base.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            index = faiss.IndexIDMap2(base)
+        else:
+            if self.metric == 'cosine':
+                base = faiss.IndexFlatIP(dimension)
+            else:
+                base = faiss.IndexFlatL2(dimension)
+            index = faiss.IndexIDMap2(base)
+        
+        self._apply_search_defaults(index)
+        index.add_with_ids(vectors, np.array(doc_ids, dtype='int64'))
+        return index
+    
+    @staticmethod
+    def _apply_search_defaults(index):
+        """Set the configured nprobe / efSearch on an approximate index."""
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = IVF_NPROBE
+        base = SemanticSearchEngine._base_index(index)
+        if isinstance(base, faiss.IndexHNSW):
+            base.hnsw.efSearch = HNSW_EF_SEARCH
+    
+    @staticmethod
+    def _base_index(index):
+        """Return the index wrapped by an ID map, or the index itself."""
+        if SemanticSearchEngine._is_id_mapped(index):
+            return faiss.downcast_index(index.index)
+        return index
+    
+    @staticmethod
+    def _index_kind(index) -> str:
+        """Classify an index as 'flat', 'ivf_flat', 'ivf_pq' or 'hnsw'."""
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            return 'ivf_pq' if isinstance(faiss.downcast_index(ivf), faiss.IndexIVFPQ) else 'ivf_flat'
+        if isinstance(SemanticSearchEngine._base_index(index), faiss.IndexHNSW):
+            return 'hnsw'
+        return 'flat'
+    
+    def _search_parameters(self, nprobe: int = None, ef_search: int = None, index=None,
+                           selector=None):
+        """Build per-query FAISS search parameters for the index type."""
+        kind = self._index_kind(self.index if index is None else index)
+        if kind in ('ivf_flat', 'ivf_pq') and (nprobe or selector is not None):
+            params = faiss.SearchParametersIVF()
+            params.nprobe = int(nprobe or IVF_NPROBE)
+        elif kind == 'hnsw' and (ef_search or selector is not None):
+            params = faiss.SearchParametersHNSW()
+            params.efSearch = int(ef_search or HNSW_EF_SEARCH)
+        elif selector is not None:
+            params = faiss.SearchParameters()
+        else:
+            return None
+        if selector is not None:
+            params.sel = selector
+        return params
+    
+    def _prepare_vectors(self, vectors: np.ndarray) -> np.ndarray:
+        """Convert vectors to contiguous float32, normalised for the cosine metric."""
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        if self.metric == 'cosine':
+            vectors = vectors.copy()
+            faiss.normalize_L2(vectors)
+        return vectors
+    
+    @staticmethod
+    def _index_metric(index) -> str:
+        """Return 'cosine' for inner-product indexes and 'l2' otherwise."""
+        return 'cosine' if index.metric_type == faiss.METRIC_INNER_PRODUCT else 'l2'
+    
+    def _to_similarity(self, distances: np.ndarray, index=None) -> np.ndarray:
+        """Convert raw FAISS distances into similarity scores (higher is better)."""
+        if self._index_metric(self.index if index is None else index) == 'cosine':
+            return distances  # Inner product of unit vectors is cosine, in [-1, 1]
+        return 1 / (1 + distances)  # Convert L2 distance to similarity
+    
+    def _similarity_radius(self, threshold: float, index=None) -> Optional[float]:
+        """Express a similarity threshold as a FAISS range_search radius."""
+        if self._index_metric(self.index if index is None else index) == 'cosine':
+            return threshold
+        if threshold <= 0:
+            return None  # Every L2 distance qualifies; no useful radius
+        return 1 / threshold - 1
+    
+    def _default_threshold(self, index=None) -> float:
+        """Configured minimum similarity for the metric of an index (the document index by default)."""
+        index = self.index if index is None else index
+        return SIMILARITY_THRESHOLDS[self.metric if index is None else self._index_metric(index)]
+    
+    def _supports_range_search(self, index) -> bool:
+        return isinstance(self._base_index(index), faiss.IndexFlat)
+    
+    def _search_index(self, query_vectors: np.ndarray, top_k: int, threshold: float,
+                      nprobe: int = None, ef_search: int = None,
+                      index=None, selector=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search an index (the document index by default) for one query.
+        
+        Returns (labels, similarities), best first, containing at most top_k
+        hits that meet the threshold. See _search_index_many.
+        """
+        return self._search_index_many(query_vectors[:1], top_k, threshold, nprobe=nprobe,
+                                       ef_search=ef_search, index=index, selector=selector)[0]
+    
+    def _search_index_many(self, query_vectors: np.ndarray, top_k: int, threshold: float,
+                           nprobe: int = None, ef_search: int = None,
+                           index=None, selector=None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Search an index with a matrix of queries in one FAISS call.
+        
+        Returns one (labels, similarities) pair per query row, best first,
+        containing at most top_k hits that meet the threshold. Flat indexes
+        apply the threshold inside FAISS via range_search; approximate
+        indexes post-filter a top_k search using the given nprobe / efSearch
+        (or the configured defaults). An optional FAISS IDSelector restricts
+        the search to the selected labels.
+        """
+        index = self.index if index is None else index
+        radius = self._similarity_radius(threshold, index)
+        if radius is not None and self._supports_range_search(index):
+            params = self._search_parameters(index=index, selector=selector)
+            if params is not None:
+                lims, distances, labels = index.range_search(query_vectors, radius, params=params)
+            else:
+                lims, distances, labels = index.range_search(query_vectors, radius)
+            results = []
+            for i in range(len(query_vectors)):
+                row_labels = labels[lims[i]:lims[i + 1]]
+                similarities = self._to_similarity(distances[lims[i]:lims[i + 1]], index)
+                if len(row_labels) > top_k:
+                    best = np.argpartition(-similarities, top_k - 1)[:top_k]
+                    row_labels, similarities = row_labels[best], similarities[best]
+                order = np.argsort(-similarities, kind='stable')
+                results.append((row_labels[order], similarities[order]))
+            return results
+        
+        params = self._search_parameters(nprobe, ef_search, index, selector)
+        if params is not None:
+            distances, labels = index.search(query_vectors, top_k, params=params)
+        else:
+            distances, labels = index.search(query_vectors, top_k)
+        similarities = self._to_similarity(distances, index)
+        keep = (labels != -1) & (similarities >= threshold)  # FAISS returns -1 for empty slots
+        return [(labels[i][keep[i]], similarities[i][keep[i]]) for i in range(len(query_vectors))]
+    
+    def _search_batch(self, requests: List[Tuple]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Run coalesced document-index searches (MicroBatcher callback).
+        
+        Each request is (query vector, top_k, threshold, nprobe, ef_search).
+        Requests sharing threshold and search parameters are stacked into one
+        matrix and searched together at their largest top_k.
+        """
+        groups = {}
+        for i, (_, _, threshold, nprobe, ef_search) in enumerate(requests):
+            groups.setdefault((threshold, nprobe, ef_search), []).append(i)
+        
+        results = [None] * len(requests)
+        for (threshold, nprobe, ef_search), members in groups.items():
+            query_matrix = np.vstack([requests[i][0] for i in members])
+            top_k = max(requests[i][1] for i in members)
+            found = self._search_index_many(query_matrix, top_k, threshold,
+                                            nprobe=nprobe, ef_search=ef_search)
+            for i, (labels, similarities) in zip(members, found):
+                k = requests[i][1]
+                results[i] = (labels[:k], similarities[:k])
+        return results
+    
+    @staticmethod
+    def _normalize_filters(filters: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Drop inactive filters and canonicalise list values."""
+        filters = filters or {}
+        active = {}
+        if filters.get('min_trust_score'):
+            active['min_trust_score'] = float(filters['min_trust_score'])
+        for name in ('categories', 'regions'):
+            if filters.get(name):
+                active[name] = sorted(set(filters[name]))
+        for name in ('keywords', 'phrase'):
+            if filters.get(name) and filters[name].strip():
+                active[name] = ' '.join(filters[name].split())
+        return active
+    
+    def check_filters(self, filters: Dict[str, Any] = None):
+        """
+        Raise ValueError if the filters cannot be applied.
+        
+        ``keywords`` and ``phrase`` need the SQLite FTS5 index; without it
+        they would silently match nothing.
+        """
+        active = [name for name in ('keywords', 'phrase') if name in self._normalize_filters(filters)]
+        if active and not self.db.has_full_text_index():
+            raise ValueError(f"The {' and '.join(active)} filter needs SQLite FTS5, "
+                             f"which this SQLite build does not provide")
+    
+    def _get_filter_columns(self) -> Dict[str, Any]:
+        """
+        Columnar filter metadata for every document, rebuilt when documents change.
+        
+        Categories and regions are stored as integer codes into a sorted
+        vocabulary so filters reduce to vectorised comparisons.
+        """
+        generation = self.db.get_documents_generation()
+        if self.filter_columns is not None and self.filter_columns['generation'] == generation:
+            return self.filter_columns
+        
+        rows = self.db.get_filter_metadata()
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        trust = np.array([row[1] or 0.0 for row in rows], dtype=np.float32)
+        categories, category_codes = np.unique(
+            np.array([row[2] or '' for row in rows], dtype=str), return_inverse=True)
+        regions, region_codes = np.unique(
+            np.array([row[3] or '' for row in rows], dtype=str), return_inverse=True)
+        
+        self.filter_columns = {
+            'generation': generation,
+            'ids': ids,  # Sorted document IDs
+            'trust_score': trust,
+            'category': category_codes.astype(np.int32),
+            'category_vocabulary': categories,
+            'region': region_codes.astype(np.int32),
+            'region_vocabulary': regions
+        }
+        return self.filter_columns
+    
+    def _filtered_document_ids(self, filters: Dict[str, Any]) -> np.ndarray:
+        """
+        Sorted IDs of the documents passing all (normalised) filters.
+        
+        ``keywords`` (all terms must occur) and ``phrase`` (exact phrase) are
+        answered by the SQLite FTS5 index and intersected with the metadata
+        filters.
+        """
+        columns = self._get_filter_columns()
+        mask = np.ones(len(columns['ids']), dtype=bool)
+        if 'min_trust_score' in filters:
+            mask &= columns['trust_score'] >= filters['min_trust_score']
+        for name, column in (('categories', 'category'), ('regions', 'region')):
+            if name in filters:
+                vocabulary = columns[f'{column}_vocabulary']
+                codes = np.flatnonzero(np.isin(vocabulary, filters[name]))
+                mask &= np.isin(columns[column], codes)
+        allowed_ids = columns['ids'][mask]
+        
+        # check_filters() has already rejected these when FTS5 is missing
+        if 'keywords' in filters:
+            matched = self.db.match_documents(filters['keywords'], match_all=True)
+            allowed_ids = np.intersect1d(allowed_ids, np.array(matched, dtype=np.int64))
+        if 'phrase' in filters:
+            matched = self.db.match_documents(filters['phrase'], phrase=True)
+            allowed_ids = np.intersect1d(allowed_ids, np.array(matched, dtype=np.int64))
+        return allowed_ids
+    
+    @staticmethod
+    def _id_selector(labels: np.ndarray):
+        """Build a FAISS bitmap selector admitting exactly the given (non-empty) labels."""
+        labels = np.asarray(labels, dtype=np.int64)
+        bits = np.zeros(int(labels.max()) + 1, dtype=bool)
+        bits[labels] = True
+        bitmap = np.packbits(bits, bitorder='little')
+        selector = faiss.IDSelectorBitmap(len(bits), faiss.swig_ptr(bitmap))
+        selector.referenced_objects = [bitmap]  # Keep the bitmap alive with the selector
+        return selector
+    
+    def _exact_similarities(self, query_vectors: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Similarity of each query to the stored vectors at the given rows, as (queries, rows)."""
+        vectors = self._prepare_vectors(self.embeddings[rows])
+        if self._index_metric(self.index) == 'cosine':
+            return query_vectors @ vectors.T
+        return self._to_similarity(np.stack([((vectors - query) ** 2).sum(axis=1)
+                                             for query in query_vectors]))
+    
+    def _rows_for_ids(self, doc_ids: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (found document IDs, their embeddings rows) for the given IDs."""
+        if self.id_sorter is None or self.id_sorter[0] != self.index_generation:
+            self.id_sorter = (self.index_generation, np.argsort(self.document_ids, kind='stable'))
+        sorter = self.id_sorter[1]
+        ids = np.asarray(doc_ids, dtype=np.int64)
+        if not len(ids) or not len(sorter):
+            return ids[:0], ids[:0]
+        positions = np.minimum(np.searchsorted(self.document_ids, ids, sorter=sorter), len(sorter) - 1)
+        rows = sorter[positions]
+        found = self.document_ids[rows] == ids
+        return ids[found], rows[found]
+    
+    def _search_filtered(self, query_vectors: np.ndarray, top_k: int, threshold: float,
+                         allowed_ids: np.ndarray, nprobe: int = None,
+                         ef_search: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search the document index restricted to allowed document IDs.
+        
+        Returns (labels, similarities) for one query; see _search_filtered_many.
+        """
+        return self._search_filtered_many(query_vectors[:1], top_k, threshold, allowed_ids,
+                                          nprobe=nprobe, ef_search=ef_search)[0]
+    
+    def _search_filtered_many(self, query_vectors: np.ndarray, top_k: int, threshold: float,
+                              allowed_ids: np.ndarray, nprobe: int = None,
+                              ef_search: int = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Search the document index for a matrix of queries, restricted to allowed document IDs.
+        
+        Small candidate sets are scored exactly against the stored vectors
+        (a pre-masked search); larger ones are searched inside FAISS with a
+        bitmap IDSelector, in one call for all queries. Either way filtering
+        happens before ranking. Returns one (labels, similarities) pair per
+        query row, best first.
+        """
+        rows = np.flatnonzero(np.isin(self.document_ids, allowed_ids))
+        if len(rows) == 0:
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))
+                    for _ in range(len(query_vectors))]
+        labels = self.document_ids[rows] if self.labels_are_ids else rows
+        
+        if self.embeddings is not None and len(rows) <= FILTER_EXACT_MAX_VECTORS:
+            results = []
+            for similarities in self._exact_similarities(query_vectors, rows):
+                keep = np.flatnonzero(similarities >= threshold)
+                if len(keep) > top_k:
+                    keep = keep[np.argpartition(-similarities[keep], top_k - 1)[:top_k]]
+                order = keep[np.argsort(-similarities[keep], kind='stable')]
+                results.append((np.asarray(labels[order]), similarities[order]))
+            return results
+        
+        # Widen the approximate search by the inverse selectivity so that
+        # enough qualifying vectors are visited to fill top_k
+        selectivity = len(rows) / max(self.index.ntotal, 1)
+        kind = self._index_kind(self.index)
+        if kind == 'hnsw':
+            ef_search = max(ef_search or HNSW_EF_SEARCH, int(np.ceil(top_k / selectivity)))
+        elif kind in ('ivf_flat', 'ivf_pq'):
+            nlist = faiss.extract_index_ivf(self.index).nlist
+            nprobe = min(nlist, int(np.ceil((nprobe or IVF_NPROBE) / selectivity)))
+        
+        return self._search_index_many(query_vectors, top_k, threshold, nprobe=nprobe,
+                                       ef_search=ef_search, selector=self._id_selector(labels))
+    
+    @staticmethod
+    def _is_id_mapped(index) -> bool:
+        return faiss is not None and isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2))
+    
+    def _supports_ids(self, index) -> bool:
+        """Whether vectors in the index are addressed by document ID."""
+        return self._is_id_mapped(index) or faiss.try_extract_index_ivf(index) is not None
+    
+    def _label_to_doc_id(self, label) -> Optional[int]:
+        """Translate a FAISS result label into a document ID."""
+        if self.labels_are_ids:
+            return int(label)
+        # Legacy positional index: labels are rows of the document ID array
+        if 0 <= label < len(self.document_ids):
+            return int(self.document_ids[label])
+        return None
+    
+    @staticmethod
+    def _write_array(path: Path, array: np.ndarray):
+        """Atomically write an .npy file (readers keep their old mapping)."""
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+    
+    @staticmethod
+    def _write_index(index, path: Path):
+        """Atomically write a FAISS index file."""
+        tmp_path = path.with_name(path.name + '.tmp')
+        faiss.write_index(index, str(tmp_path))
+        os.replace(tmp_path, path)
+    
+    @staticmethod
+    def _read_index(path: Path, writable: bool = False):
+        """
+        Read a FAISS index, memory-mapped unless it must be modified.
+        
+        Memory-mapped indexes are shared through the page cache by every
+        process that maps the same file, but must never be modified.
+        IO_FLAG_MMAP_IFC also maps flat codes, but some FAISS versions reject
+        it for IVF indexes, which then get plain IO_FLAG_MMAP.
+        """
+        if not writable:
+            flag_sets = [faiss.IO_FLAG_MMAP]
+            if getattr(faiss, 'IO_FLAG_MMAP_IFC', 0):
+                flag_sets.insert(0, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_MMAP_IFC)
+            for flags in flag_sets:
+                try:
+                    return faiss.read_index(str(path), flags), False
+                except RuntimeError as e:
+                    error = e
+                    logger.debug(f"Memory-mapped read of {path.name} with flags {flags:#x} failed: {str(e)}")
+            logger.warning(f"Could not memory-map {path.name}; loading a private copy: {str(error)}")
+        return faiss.read_index(str(path)), True
+    
+    def _chunk_document(self, doc: Dict[str, Any]) -> List[Tuple[str, str]]:
+        """
+        Split a document into (section_name, text) chunks for embedding.
+        
+        Each SF84 section becomes one chunk, or several overlapping chunks of
+        at most CHUNK_MAX_WORDS words when it would exceed the model's input
+        limit. Chunks are prefixed with the project name for context.
+        Documents without parsed sections are chunked from their searchable text.
+        """
+        sections = [(field, str(doc[field])) for field in CHUNK_SECTIONS if doc.get(field)]
+        if not sections:
+            searchable_text = self._document_text(doc)
+            if searchable_text:
+                sections = [('searchable_text', searchable_text)]
+        
+        title = doc.get('project_name') or ''
+        step = max(CHUNK_MAX_WORDS - CHUNK_OVERLAP_WORDS, 1)
+        chunks = []
+        for field, text in sections:
+            words = text.split()
+            for part, start in enumerate(range(0, max(len(words) - CHUNK_OVERLAP_WORDS, 1), step)):
+                piece = ' '.join(words[start:start + CHUNK_MAX_WORDS])
+                section_name = field if part == 0 else f"{field}:{part + 1}"
+                chunks.append((section_name, f"{title}: {piece}" if title else piece))
+        return chunks
+    
+    def create_chunk_embeddings(self, force_rebuild: bool = False) -> bool:
+        """
+        Embed documents section by section and build the chunk index.
+        
+        One vector per chunk is stored in the embeddings table as float32
+        bytes. Documents whose chunks and model are unchanged keep their
+        stored vectors; the rest are re-encoded (through the embedding cache)
+        in one batch. The chunk index is then rebuilt from the stored vectors.
+        """
+        stored = {}
+        for row in self.db.get_embedding_chunks():
+            stored.setdefault(row['document_id'], []).append(row)
+        
+        pending = []
+        for doc in self.db.get_all_documents():
+            chunks = self._chunk_document(doc)
+            rows = stored.pop(doc['id'], [])
+            unchanged = (
+                [(row['section_name'], row['text_content']) for row in rows] == chunks
+                and all(row['model_name'] == self.model_name for row in rows)
             )
+            if force_rebuild or not unchanged:
+                pending.append((doc['id'], chunks))
+        
+        # Whatever is left belongs to documents that no longer exist
+        orphaned = list(stored)
+        
+        try:
+            texts = [text for _, chunks in pending for _, text in chunks]
+            if texts:
+                logger.info(f"Generating embeddings for {len(texts)} chunks "
+                            f"from {len(pending)} documents...")
+                vectors = self._encode_documents(texts)
             
-            # Convert distances to similarity scores (lower distance = higher similarity)
-            similarities = 1 / (1 + distances[0])  # Convert L2 distance to similarity
+            with self.db.transaction():
+                position = 0
+                for doc_id, chunks in pending:
+                    rows = [
+                        (section_name, text, np.asarray(vectors[position + i], dtype=np.float32).tobytes())
+                        for i, (section_name, text) in enumerate(chunks)
+                    ]
+                    position += len(chunks)
+                    self.db.replace_embeddings(doc_id, self.model_name, rows)
+                if orphaned:
+                    self.db.delete_embeddings(orphaned)
             
-            # Get results
-            results = []
-            for i, (idx, similarity) in enumerate(zip(indices[0], similarities)):
-                if idx == -1:  # FAISS returns -1 for empty slots
-                    continue
+            return self._build_chunk_index()
+            
+        except Exception as e:
+            logger.error(f"Error creating chunk embeddings: {str(e)}")
+            return False
+    
+    def _build_chunk_index(self) -> bool:
+        """Build and save the chunk index from vectors stored in the embeddings table."""
+        rows = [row for row in self.db.get_embedding_chunks(with_vectors=True)
+                if row['model_name'] == self.model_name]
+        if not rows:
+            logger.error("No chunk embeddings found")
+            return False
+        
+        if _import_faiss() is None:
+            raise ImportError("faiss-cpu not available. Install with: pip install faiss-cpu")
+        
+        vectors = np.vstack([np.frombuffer(row['embedding_vector'], dtype=np.float32) for row in rows])
+        index = self._build_index(self._prepare_vectors(vectors), [row['id'] for row in rows])
+        chunk_map = np.array(
+            [(row['id'], row['document_id'], row['section_name'][:64]) for row in rows],
+            dtype=CHUNK_MAP_DTYPE
+        )
+        chunk_map.sort(order='id')
+        
+        self._write_index(index, self.chunk_index_file)
+        self._write_array(self.chunk_map_file, chunk_map)
+        manifest_tmp = self.chunk_manifest_file.with_name(self.chunk_manifest_file.name + '.tmp')
+        with open(manifest_tmp, 'w') as f:
+            json.dump({'model_name': self.model_name}, f)
+        os.replace(manifest_tmp, self.chunk_manifest_file)
+        
+        self.index_generation += 1
+        self.chunk_index = index
+        self.chunk_map = chunk_map
+        self.chunk_index_model = self.model_name
+        logger.info(f"Built chunk index with {index.ntotal} chunks")
+        return True
+    
+    def _load_chunk_index(self) -> bool:
+        """Load the chunk index and chunk mapping from disk, once across threads."""
+        with self._load_lock:
+            if self.chunk_index is not None:
+                return True
+            try:
+                if not (self.chunk_index_file.exists() and self.chunk_map_file.exists()):
+                    return False
                 
-                # Apply similarity threshold
-                if similarity < threshold:
-                    continue
+                signature = self.index_signature()
+                if _import_faiss() is None:
+                    raise ImportError("faiss-cpu not available")
                 
-                # Get document ID and fetch document
-                doc_id = self.document_map.get(idx)
-                if doc_id is None:
-                    continue
+                chunk_index, _ = self._read_index(self.chunk_index_file)
+                self._apply_search_defaults(chunk_index)
+                self.chunk_map = np.load(self.chunk_map_file, mmap_mode='r')
+                # Chunk indexes without a manifest predate model tracking
+                chunk_index_model = EMBEDDING_MODEL
+                if self.chunk_manifest_file.exists():
+                    with open(self.chunk_manifest_file) as f:
+                        chunk_index_model = json.load(f).get('model_name') or EMBEDDING_MODEL
+                self.chunk_index_model = chunk_index_model
+                self.index_generation += 1
+                self.loaded_signature = self.loaded_signature or signature
+                self.chunk_index = chunk_index
+                return True
                 
-                document = self.db.get_document(doc_id)
-                if document is None:
-                    continue
+            except Exception as e:
+                logger.error(f"Error loading chunk index: {str(e)}")
+                return False
+    
+    def _search_chunks(self, query_vectors: np.ndarray, top_k: int, threshold: float,
+                       nprobe: int = None, ef_search: int = None,
+                       allowed_ids: np.ndarray = None) -> List[Tuple[int, float, int, str]]:
+        """
+        Search the chunk index and collapse chunk hits into document hits.
+        
+        Chunk similarities are pooled per document with CHUNK_POOLING ("max"
+        keeps the best chunk, "sum" rewards documents matching in several
+        sections). ``allowed_ids`` restricts the search to chunks of those
+        documents. Returns (doc_id, score, rank, best_section) tuples.
+        """
+        selector = None
+        if allowed_ids is not None:
+            allowed_chunks = self.chunk_map['id'][np.isin(self.chunk_map['document_id'], allowed_ids)]
+            if len(allowed_chunks) == 0:
+                return []
+            selector = self._id_selector(allowed_chunks)
+        
+        labels, similarities = self._search_index(
+            query_vectors, top_k * CHUNK_OVERSAMPLE, threshold,
+            nprobe=nprobe, ef_search=ef_search, index=self.chunk_index, selector=selector
+        )
+        
+        chunk_ids = self.chunk_map['id']
+        positions = np.minimum(np.searchsorted(chunk_ids, labels), max(len(chunk_ids) - 1, 0))
+        
+        scores = {}
+        best_section = {}
+        for label, position, similarity in zip(labels, positions, similarities):
+            if len(chunk_ids) == 0 or chunk_ids[position] != label:
+                continue
+            entry = self.chunk_map[position]
+            doc_id, section_name = int(entry['document_id']), str(entry['section'])
+            if CHUNK_POOLING == 'sum':
+                scores[doc_id] = scores.get(doc_id, 0.0) + float(similarity)
+            else:
+                scores[doc_id] = max(scores.get(doc_id, float('-inf')), float(similarity))
+            best_section.setdefault(doc_id, section_name)  # Labels arrive best first
+        
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(doc_id, score, rank, best_section[doc_id])
+                for rank, (doc_id, score) in enumerate(ranked, 1)]
+    
+    def create_lexical_index(self) -> bool:
+        """Build and save the BM25 keyword index over all documents."""
+        try:
+            documents = [(doc['id'], self._lexical_text(doc)) for doc in self.db.get_all_documents()]
+            index = BM25Index.build(documents, k1=BM25_K1, b=BM25_B)
+            index.save(self.lexical_index_file)
+            self.lexical_index = index
+            logger.info(f"Lexical index built for {len(index)} documents")
+            return True
+        except Exception as e:
+            logger.error(f"Error creating lexical index: {str(e)}")
+            return False
+    
+    def _load_lexical_index(self) -> bool:
+        """Load the BM25 keyword index from disk, once across threads."""
+        with self._load_lock:
+            if self.lexical_index is not None:
+                return True
+            try:
+                if not self.lexical_index_file.exists():
+                    return False
+                signature = self.index_signature()
+                self.lexical_index = BM25Index.load(self.lexical_index_file)
+                self.loaded_signature = self.loaded_signature or signature
+                return True
+            except Exception as e:
+                logger.error(f"Error loading lexical index: {str(e)}")
+                return False
+    
+    def _fuse_hits(self, query: str, query_vectors: np.ndarray,
+                   semantic_hits: List[Tuple[int, float, int, Optional[str]]], top_k: int,
+                   allowed_ids: np.ndarray = None) -> Tuple[List[Tuple], Dict[int, float]]:
+        """
+        Fuse semantic hits with BM25 keyword hits by reciprocal rank fusion.
+        
+        Returns the fused top_k (doc_id, similarity, rank, section) hits and a
+        doc_id -> BM25 score map. Keyword-only hits are given their exact
+        semantic similarity from the stored vectors when those are loaded.
+        Documents deleted since the lexical index was built are dropped
+        before truncating to top_k, so they never take a result slot.
+        """
+        lexical_ids, lexical_scores = self.lexical_index.search(
+            query, max(top_k, HYBRID_CANDIDATES), allowed_ids=allowed_ids)
+        
+        fused = {}
+        for rank, hit in enumerate(semantic_hits, 1):
+            fused[hit[0]] = 1 / (RRF_K + rank)
+        for rank, doc_id in enumerate(lexical_ids.tolist(), 1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1 / (RRF_K + rank)
+        
+        candidates = np.array(list(fused), dtype=np.int64)
+        live_ids = self._get_filter_columns()['ids']
+        positions = np.minimum(np.searchsorted(live_ids, candidates), max(len(live_ids) - 1, 0))
+        live = (live_ids[positions] == candidates) if len(live_ids) else np.zeros(len(candidates), bool)
+        for doc_id in candidates[~live].tolist():
+            del fused[doc_id]
+        ranked = sorted(fused, key=fused.get, reverse=True)[:top_k]
+        
+        semantic = {hit[0]: hit for hit in semantic_hits}
+        similarities = {}
+        keyword_only = [doc_id for doc_id in ranked if doc_id not in semantic]
+        if keyword_only and self.embeddings is not None:
+            found_ids, rows = self._rows_for_ids(keyword_only)
+            similarities = dict(zip(found_ids.tolist(),
+                                    self._exact_similarities(query_vectors, rows)[0].tolist()))
+        
+        hits = []
+        for rank, doc_id in enumerate(ranked, 1):
+            if doc_id in semantic:
+                hits.append((doc_id, semantic[doc_id][1], rank, semantic[doc_id][3]))
+            else:
+                hits.append((doc_id, float(similarities.get(doc_id, 0.0)), rank, None))
+        return hits, dict(zip(lexical_ids.tolist(), lexical_scores.tolist()))
+    
+    def _embeddings_exist(self) -> bool:
+        """Check if embeddings files exist."""
+        return (self.index_file.exists() and
+                (self.ids_file.exists() or self.legacy_map_file.exists()))
+    
+    def index_signature(self) -> Tuple:
+        """
+        Modification time and size of each on-disk index file.
+        
+        Index files are replaced atomically whenever they are rebuilt or
+        updated, so a changed signature means another process (or another
+        engine) has written a new index generation.
+        """
+        signature = []
+        for path in (self.index_file, self.ids_file, self.manifest_file,
+                     self.chunk_index_file, self.lexical_index_file):
+            try:
+                stat = path.stat()
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+    
+    def _save_embeddings(self, embeddings: np.ndarray, index, document_ids: List[int],
+                         fingerprints: Dict[int, str] = None):
+        """
+        Save embeddings, FAISS index, and document IDs to disk.
+        
+        Embeddings are a raw float32 .npy matrix and document IDs an aligned
+        int64 .npy array, both loadable with np.memmap without copying.
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        document_ids = np.asarray(document_ids, dtype=np.int64)
+        
+        # Save embeddings and their document IDs
+        self._write_array(self.embeddings_file, embeddings)
+        self._write_array(self.ids_file, document_ids)
+        
+        # Save FAISS index
+        self._write_index(index, self.index_file)
+        
+        # Save content fingerprints used by incremental updates
+        fingerprints = fingerprints or {}
+        manifest_tmp = self.manifest_file.with_name(self.manifest_file.name + '.tmp')
+        with open(manifest_tmp, 'w') as f:
+            json.dump({
+                'model_name': self.model_name,
+                'fingerprints': {str(doc_id): value for doc_id, value in fingerprints.items()}
+            }, f)
+        os.replace(manifest_tmp, self.manifest_file)
+        
+        # Update instance variables
+        self.index_generation += 1
+        self.index = index
+        self.index_writable = True
+        self.labels_are_ids = self._supports_ids(index)
+        self.embeddings = embeddings
+        self.document_ids = document_ids
+        self.fingerprints = fingerprints
+        self.fingerprint_model = self.model_name
+        self.index_model = self.model_name
+        self.loaded_signature = self.index_signature()
+    
+    def _load_embeddings(self, writable: bool = False) -> bool:
+        """
+        Load the FAISS index, embeddings and document IDs from disk.
+        
+        By default the index and arrays are memory-mapped, so API worker
+        processes share one physical copy through the page cache. Pass
+        ``writable=True`` to get an index that can be updated in place.
+        Concurrent read-only loads happen once; ``self.index`` is assigned
+        last, so a search that sees it set also sees its document IDs.
+        """
+        with self._load_lock:
+            if not writable and self.index is not None:
+                return True  # Loaded by another thread while this one waited
+            try:
+                if not self._embeddings_exist():
+                    return False
                 
-                # Add search metadata
-                document['similarity_score'] = float(similarity)
-                document['search_rank'] = i + 1
+                # Taken before reading, so files replaced mid-load look stale
+                signature = self.index_signature()
                 
-                # Create text snippet
-                searchable_text = document.get('searchable_text', '')
-                snippet = self._create_snippet(searchable_text, query)
-                document['snippet'] = snippet
+                # Load FAISS index
+                if _import_faiss() is None:
+                    raise ImportError("faiss-cpu not available")
+                
+                index, index_writable = self._read_index(self.index_file, writable)
+                self._apply_search_defaults(index)
+                
+                # Load embeddings and document IDs
+                if self.ids_file.exists():
+                    document_ids = np.load(self.ids_file, mmap_mode='r')
+                    embeddings = (np.load(self.embeddings_file, mmap_mode='r')
+                                  if self.embeddings_file.exists() else None)
+                else:
+                    # Index built before the .npy store: positions map to IDs via a pickle
+                    with open(self.legacy_map_file, 'rb') as f:
+                        document_map = pickle.load(f)
+                    document_ids = np.array([document_map[i] for i in range(len(document_map))],
+                                            dtype=np.int64)
+                    embeddings = None
+                
+                # Load fingerprints (absent for indexes built before incremental updates)
+                fingerprints = {}
+                fingerprint_model = None
+                if self.manifest_file.exists():
+                    with open(self.manifest_file) as f:
+                        manifest = json.load(f)
+                    fingerprints = {int(doc_id): value
+                                    for doc_id, value in manifest.get('fingerprints', {}).items()}
+                    fingerprint_model = manifest.get('model_name')
                 
-                results.append(document)
+                self.document_ids = document_ids
+                self.embeddings = embeddings
+                self.fingerprints = fingerprints
+                self.fingerprint_model = fingerprint_model
+                # Indexes without a manifest predate model tracking, when only
+                # EMBEDDING_MODEL was ever used
+                self.index_model = fingerprint_model or EMBEDDING_MODEL
+                self.labels_are_ids = self._supports_ids(index)
+                self.index_writable = index_writable
+                self.index_generation += 1
+                self.loaded_signature = signature
+                self.index = index
+                
+                logger.info(f"Loaded embeddings for {len(self.document_ids)} documents")
+                return True
+                
+            except Exception as e:
+                logger.error(f"Error loading embeddings: {str(e)}")
+                return False
+    
+    def _index_model_matches(self, use_chunks: bool = False) -> bool:
+        """Check the loaded (chunk) index was built by the model encoding queries; logs if not."""
+        if use_chunks:
+            index, index_model, name = self.chunk_index, self.chunk_index_model, "Chunk index"
+        else:
+            index, index_model, name = self.index, self.index_model, "Index"
+        if index is None or index_model == self.model_name:
+            return True
+        logger.error(f"{name} was built with '{index_model}' but queries are encoded with "
+                     f"'{self.model_name}'; rebuild the index before searching")
+        return False
+    
+    def search(self, query: str, top_k: int = None, threshold: float = None,
+               nprobe: int = None, ef_search: int = None,
+               use_chunks: bool = None,
+               filters: Dict[str, Any] = None,
+               hybrid: bool = None) -> List[Dict[str, Any]]:
+        """
+        Perform semantic search for similar documents.
+        
+        ``nprobe`` (IVF indexes) and ``ef_search`` (HNSW indexes) override the
+        configured recall/latency trade-off for this query only. With
+        ``use_chunks`` (default SEARCH_USE_CHUNKS) documents are ranked by
+        their best-matching section chunks instead of one whole-text vector.
+        ``filters`` may hold ``min_trust_score``, ``categories``, ``regions``,
+        ``keywords`` and ``phrase``; they are applied inside the index, before
+        ranking, so up to top_k qualifying documents are returned. With
+        ``hybrid`` (default SEARCH_HYBRID) semantic hits are fused with BM25
+        keyword hits, which catches project numbers and names that
+        embeddings match poorly. ``threshold`` defaults to the
+        SIMILARITY_THRESHOLDS entry for the searched index's metric; an
+        explicit 0.0 keeps every hit. Raises ValueError for filters that
+        cannot be applied (see check_filters).
+        """
+        top_k = top_k or MAX_SEARCH_RESULTS
+        use_chunks = SEARCH_USE_CHUNKS if use_chunks is None else use_chunks
+        self.check_filters(filters)
+        filters = self._normalize_filters(filters)
+        hybrid = SEARCH_HYBRID if hybrid is None else hybrid
+        
+        if hybrid and self.lexical_index is None and not self._load_lexical_index():
+            logger.debug("No lexical index found; using semantic search only")
+            hybrid = False
+        
+        if use_chunks and self.chunk_index is None and not self._load_chunk_index():
+            logger.warning("No chunk index found; falling back to document search")
+            use_chunks = False
+        
+        # Load embeddings if not already loaded
+        if not use_chunks and self.index is None:
+            if not self._load_embeddings():
+                logger.error("No embeddings found. Please create embeddings first.")
+                return []
+        
+        # Vectors from different models are not comparable
+        if not self._index_model_matches(use_chunks):
+            return []
+        
+        if threshold is None:
+            threshold = self._default_threshold(self.chunk_index if use_chunks else None)
+        
+        try:
+            # Serve repeated searches against an unchanged index from cache
+            cache_key = self._result_cache_key(query, top_k, threshold, filters=filters, nprobe=nprobe,
+                                               ef_search=ef_search, use_chunks=use_chunks,
+                                               hybrid=hybrid)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                self._record_search(query, len(cached))
+                return [dict(document) for document in cached]
+            
+            # Encode query
+            query_embedding = self._encode_query(query)
+            query_vectors = self._prepare_vectors(query_embedding.reshape(1, -1))
+            
+            allowed_ids = self._filtered_document_ids(filters) if filters else None
+            
+            # Hybrid search fuses a deeper semantic candidate list with keyword hits
+            candidates = max(top_k, HYBRID_CANDIDATES) if hybrid else top_k
+            
+            if use_chunks:
+                hits = self._search_chunks(query_vectors, candidates, threshold,
+                                           nprobe=nprobe, ef_search=ef_search,
+                                           allowed_ids=allowed_ids)
+            elif allowed_ids is not None:
+                indices, similarities = self._search_filtered(
+                    query_vectors, candidates, threshold, allowed_ids,
+                    nprobe=nprobe, ef_search=ef_search
+                )
+            else:
+                # Search FAISS index, batched with concurrent queries; only
+                # hits meeting the threshold come back
+                indices, similarities = self.search_batcher.submit(
+                    (query_vectors[0], candidates, threshold, nprobe, ef_search)
+                )
             
-            # Store search in history
-            self.db.store_search(query, len(results))
+            if not use_chunks:
+                hits = self._labels_to_hits(indices, similarities)
+            
+            keyword_scores = {}
+            if hybrid:
+                hits, keyword_scores = self._fuse_hits(query, query_vectors, hits, top_k, allowed_ids)
+            
+            # Hydrate all hits, with FTS5 snippets, in a single database round trip
+            documents = {doc['id']: doc for doc in
+                         self.db.get_documents_with_snippets([hit[0] for hit in hits], query)}
+            results = self._assemble_results(query, hits, documents, keyword_scores)
+            
+            self.result_cache.put(cache_key, [dict(document) for document in results])
+            
+            # Store search in history (queued; written off the query path)
+            self._record_search(query, len(results))
             
             logger.info(f"Search for '{query}' returned {len(results)} results")
             return results
@@ -240,45 +1509,217 @@ class SemanticSearchEngine:
             logger.error(f"Search error: {str(e)}")
             return []
     
+    def search_many(self, queries: List[str], top_k: int = None, threshold: float = None,
+                    nprobe: int = None, ef_search: int = None,
+                    use_chunks: bool = None,
+                    filters: Dict[str, Any] = None,
+                    hybrid: bool = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search for many queries at once, ranking exactly as search() does.
+        
+        Queries not served from the result cache are encoded with one model
+        call and searched with one FAISS call over the query matrix (chunk
+        searches run per query). All hits are hydrated with a single database
+        query, and snippets are extracted in Python rather than by FTS5.
+        Returns one result list per query, in order. Arguments are as for
+        search() and apply to every query.
+        """
+        top_k = top_k or MAX_SEARCH_RESULTS
+        use_chunks = SEARCH_USE_CHUNKS if use_chunks is None else use_chunks
+        self.check_filters(filters)
+        filters = self._normalize_filters(filters)
+        hybrid = SEARCH_HYBRID if hybrid is None else hybrid
+        
+        if hybrid and self.lexical_index is None and not self._load_lexical_index():
+            hybrid = False
+        
+        if use_chunks and self.chunk_index is None and not self._load_chunk_index():
+            logger.warning("No chunk index found; falling back to document search")
+            use_chunks = False
+        
+        if not use_chunks and self.index is None and not self._load_embeddings():
+            logger.error("No embeddings found. Please create embeddings first.")
+            return [[] for _ in queries]
+        
+        if not self._index_model_matches(use_chunks):
+            return [[] for _ in queries]
+        
+        if threshold is None:
+            threshold = self._default_threshold(self.chunk_index if use_chunks else None)
+        
+        try:
+            results = [None] * len(queries)
+            cache_keys = []
+            pending = []
+            for i, query in enumerate(queries):
+                cache_key = self._result_cache_key(query, top_k, threshold, filters=filters,
+                                                   nprobe=nprobe, ef_search=ef_search,
+                                                   use_chunks=use_chunks, hybrid=hybrid)
+                cache_keys.append(cache_key)
+                cached = self.result_cache.get(cache_key)
+                if cached is not None:
+                    results[i] = [dict(document) for document in cached]
+                else:
+                    pending.append(i)
+            
+            if pending:
+                query_vectors = self._prepare_vectors(self._encode_queries([queries[i] for i in pending]))
+                allowed_ids = self._filtered_document_ids(filters) if filters else None
+                candidates = max(top_k, HYBRID_CANDIDATES) if hybrid else top_k
+                
+                if use_chunks:
+                    found = [self._search_chunks(query_vectors[j:j + 1], candidates, threshold,
+                                                 nprobe=nprobe, ef_search=ef_search,
+                                                 allowed_ids=allowed_ids)
+                             for j in range(len(pending))]
+                elif allowed_ids is not None:
+                    found = [self._labels_to_hits(labels, similarities) for labels, similarities in
+                             self._search_filtered_many(query_vectors, candidates, threshold,
+                                                        allowed_ids, nprobe=nprobe,
+                                                        ef_search=ef_search)]
+                else:
+                    found = [self._labels_to_hits(labels, similarities) for labels, similarities in
+                             self._search_index_many(query_vectors, candidates, threshold,
+                                                     nprobe=nprobe, ef_search=ef_search)]
+                
+                fused = []
+                for j, i in enumerate(pending):
+                    hits = found[j]
+                    keyword_scores = {}
+                    if hybrid:
+                        hits, keyword_scores = self._fuse_hits(queries[i], query_vectors[j:j + 1],
+                                                               hits, top_k, allowed_ids)
+                    fused.append((hits, keyword_scores))
+                
+                # One query hydrates every hit; snippets are then cut per query in Python
+                documents = {doc['id']: doc for doc in self.db.get_documents(
+                    [hit[0] for hits, _ in fused for hit in hits])}
+                for (hits, keyword_scores), i in zip(fused, pending):
+                    results[i] = self._assemble_results(queries[i], hits, documents, keyword_scores)
+                    self.result_cache.put(cache_keys[i], [dict(document) for document in results[i]])
+            
+            for query, query_results in zip(queries, results):
+                self._record_search(query, len(query_results))
+            
+            logger.info(f"Batch search for {len(queries)} queries ({len(pending)} uncached)")
+            return results
+            
+        except Exception as e:
+            logger.error(f"Batch search error: {str(e)}")
+            return [[] for _ in queries]
+    
+    def _labels_to_hits(self, labels: np.ndarray,
+                        similarities: np.ndarray) -> List[Tuple[int, float, int, Optional[str]]]:
+        """Turn FAISS labels into (doc_id, similarity, rank, section) hits in rank order."""
+        hits = []
+        for i, (label, similarity) in enumerate(zip(labels, similarities)):
+            doc_id = self._label_to_doc_id(label)
+            if doc_id is None:
+                continue
+            hits.append((doc_id, float(similarity), i + 1, None))
+        return hits
+    
+    def _assemble_results(self, query: str, hits: List[Tuple], documents: Dict[int, Dict[str, Any]],
+                          keyword_scores: Dict[int, float]) -> List[Dict[str, Any]]:
+        """Build result dicts for hits from hydrated documents, adding search metadata."""
+        results = []
+        for doc_id, similarity, rank, section_name in hits:
+            document = documents.get(doc_id)
+            if document is None:
+                continue
+            document = dict(document)
+            
+            # Add search metadata
+            document['similarity_score'] = similarity
+            document['search_rank'] = rank
+            if section_name:
+                document['matched_section'] = section_name
+            if doc_id in keyword_scores:
+                document['keyword_score'] = keyword_scores[doc_id]
+            
+            # Scan the text for a snippet only when FTS5 found no query term
+            if not document.get('snippet'):
+                searchable_text = document.get('searchable_text', '')
+                document['snippet'] = self._create_snippet(searchable_text, query)
+            
+            results.append(document)
+        return results
+    
+    def _record_search(self, query: str, results_count: int):
+        """Add a search to the history, via the background writer when enabled."""
+        if SEARCH_HISTORY_ASYNC:
+            get_history_writer(self.db).record(query, results_count)
+        else:
+            self.db.store_search(query, results_count)
+    
+    def _result_cache_key(self, query: str, top_k: int, threshold: float,
+                          filters: Dict[str, Any] = None, nprobe: int = None,
+                          ef_search: int = None, use_chunks: bool = False,
+                          hybrid: bool = False) -> Tuple:
+        """
+        Build the result cache key for a search.
+        
+        Includes the index generation (bumped whenever embeddings are saved or
+        loaded) and the documents table generation, so any index rebuild or
+        document change invalidates previously cached results.
+        """
+        frozen_filters = tuple(sorted(
+            (name, tuple(value) if isinstance(value, (list, set, tuple)) else value)
+            for name, value in (filters or {}).items()
+        ))
+        return (normalize_query(query), top_k, threshold, frozen_filters, nprobe, ef_search,
+                use_chunks, hybrid, self.index_generation, self.db.get_documents_generation())
+    
     def _create_snippet(self, text: str, query: str, max_length: int = 200) -> str:
         """Create a relevant snippet from document text."""
-        if not text or len(text) <= max_length:
-            return text
-        
-        # Simple approach: find query terms and extract context
-        query_words = query.lower().split()
-        text_lower = text.lower()
-        
-        # Find the best position to extract snippet
-        best_pos = 0
-        max_matches = 0
-        
-        # Check every possible snippet position
-        for i in range(0, len(text) - max_length, 50):  # Step by 50 chars
-            snippet_text = text_lower[i:i + max_length]
-            matches = sum(1 for word in query_words if word in snippet_text)
-            if matches > max_matches:
-                max_matches = matches
-                best_pos = i
-        
-        # Extract snippet
-        snippet = text[best_pos:best_pos + max_length]
-        
-        # Clean up snippet boundaries (avoid cutting words)
-        if best_pos > 0:
-            # Find start of word
-            space_idx = snippet.find(' ')
-            if space_idx > 0:
-                snippet = snippet[space_idx + 1:]
-        
-        if best_pos + max_length < len(text):
-            # Find end of word
-            space_idx = snippet.rfind(' ')
-            if space_idx > 0:
-                snippet = snippet[:space_idx]
-            snippet += "..."
-        
-        return snippet.strip()
+        return extract_snippet(text, query, max_length)
+    
+    def warm_up(self, query: str = None) -> Dict[str, float]:
+        """
+        Load the model and indexes and run one query through every stage.
+        
+        Touches the memory-mapped index pages, the filter columns, the
+        lexical index and the database connection so the first real search
+        is not cold. The warm-up query is neither cached nor recorded in
+        search history. Returns the seconds spent on each stage; raises if
+        no index has been built.
+        """
+        query = query or WARMUP_QUERY
+        timings = {}
+        
+        started = time.perf_counter()
+        self.verify_encoder_backend()
+        self._load_model()
+        query_embedding = self._encode_texts([query])[0]
+        timings['model'] = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        if self.index is None and not self._load_embeddings():
+            raise RuntimeError("No embeddings found. Please create embeddings first.")
+        if not self._index_model_matches():
+            raise RuntimeError(f"Index was built with '{self.index_model}', not '{self.model_name}'")
+        if SEARCH_HYBRID and self.lexical_index is None:
+            self._load_lexical_index()
+        if SEARCH_USE_CHUNKS and self.chunk_index is None:
+            self._load_chunk_index()
+        if not self._index_model_matches(use_chunks=True):
+            raise RuntimeError(f"Chunk index was built with '{self.chunk_index_model}', "
+                               f"not '{self.model_name}'")
+        self._get_filter_columns()
+        timings['index'] = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        query_vectors = self._prepare_vectors(query_embedding.reshape(1, -1))
+        top_k = max(MAX_SEARCH_RESULTS, HYBRID_CANDIDATES)
+        indices, similarities = self._search_index(query_vectors, top_k, self._default_threshold())
+        hits = self._labels_to_hits(indices, similarities)
+        if self.lexical_index is not None:
+            hits, _ = self._fuse_hits(query, query_vectors, hits, MAX_SEARCH_RESULTS, None)
+        self.db.get_documents_with_snippets([hit[0] for hit in hits], query)
+        timings['query'] = time.perf_counter() - started
+        
+        logger.info(f"Search engine warmed up in {sum(timings.values()):.2f}s")
+        return timings
     
     def get_index_stats(self) -> Dict[str, Any]:
         """Get statistics about the search index."""
@@ -286,20 +1727,101 @@ class SemanticSearchEngine:
             'embeddings_exist': self._embeddings_exist(),
             'index_loaded': self.index is not None,
             'total_documents': 0,
-            'model_name': self.model_name
+            'model_name': self.model_name,
+            'encoder_backend': self.encoder_backend,
+            'metric': self._index_metric(self.index) if self.index is not None else self.metric,
+            'index_type': self._index_kind(self.index) if self.index is not None else None,
+            'query_cache': dict(self.query_cache.stats(), disk_hits=self.query_disk_hits),
+            'result_cache': self.result_cache.stats(),
+            'index_generation': self.index_generation,
+            'query_batching': {'encode': self.encode_batcher.stats(),
+                               'search': self.search_batcher.stats()},
+            'total_chunks': self.chunk_index.ntotal if self.chunk_index is not None else 0,
+            'lexical_documents': len(self.lexical_index) if self.lexical_index is not None else 0,
+            'search_history': get_history_writer(self.db).stats() if SEARCH_HISTORY_ASYNC else None
         }
         
         if self.index is not None:
             stats['total_documents'] = self.index.ntotal
-        elif self.document_map:
-            stats['total_documents'] = len(self.document_map)
+        elif len(self.document_ids):
+            stats['total_documents'] = len(self.document_ids)
         
         return stats
     
+    def recall_report(self, top_k: int = 10, sample_size: int = 200,
+                      nprobe_values: List[int] = None,
+                      ef_search_values: List[int] = None) -> Dict[str, Any]:
+        """
+        Measure recall@k and latency of the loaded index against exact search.
+        
+        A sample of stored document vectors is used as queries. Each is
+        searched with an exact flat index over the same vectors and with the
+        approximate index at every nprobe (IVF) or efSearch (HNSW) value.
+        Recall is the mean overlap of the returned top_k sets.
+        """
+        if self.index is None and not self._load_embeddings():
+            return {}
+        
+        if self.embeddings is not None:
+            vectors = self._prepare_vectors(np.array(self.embeddings, dtype='float32'))
+        else:
+            vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        doc_ids = self.document_ids if self.labels_are_ids else np.arange(len(vectors))
+        
+        exact = faiss.IndexFlatIP(vectors.shape[1]) if self._index_metric(self.index) == 'cosine' \
+            else faiss.IndexFlatL2(vectors.shape[1])
+        exact = faiss.IndexIDMap2(exact)
+        exact.add_with_ids(vectors, np.asarray(doc_ids, dtype='int64'))
+        
+        rng = np.random.default_rng(0)
+        picks = rng.choice(len(doc_ids), min(sample_size, len(doc_ids)), replace=False)
+        queries = np.ascontiguousarray(vectors[picks])
+        k = min(top_k, len(doc_ids))
+        
+        start = time.perf_counter()
+        _, truth = exact.search(queries, k)
+        flat_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        
+        kind = self._index_kind(self.index)
+        if kind in ('ivf_flat', 'ivf_pq'):
+            settings = [('nprobe', v) for v in (nprobe_values or [1, 4, 16, 64])]
+        elif kind == 'hnsw':
+            settings = [('ef_search', v) for v in (ef_search_values or [16, 32, 64, 128])]
+        else:
+            settings = [(None, None)]
+        
+        rows = []
+        for name, value in settings:
+            params = self._search_parameters(**({name: value} if name else {}))
+            start = time.perf_counter()
+            if params is not None:
+                _, found = self.index.search(queries, k, params=params)
+            else:
+                _, found = self.index.search(queries, k)
+            elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+            
+            overlap = [len(set(t) & set(f)) / k for t, f in zip(truth, found)]
+            rows.append({
+                'parameter': name,
+                'value': value,
+                'recall_at_k': round(float(np.mean(overlap)), 4),
+                'ms_per_query': round(elapsed_ms, 4)
+            })
+        
+        return {
+            'index_type': kind,
+            'total_vectors': len(doc_ids),
+            'queries': len(queries),
+            'top_k': k,
+            'flat_ms_per_query': round(flat_ms, 4),
+            'results': rows
+        }
+    
     def rebuild_index(self) -> bool:
         """Rebuild the search index from scratch."""
         logger.info("Rebuilding search index...")
-        return self.create_embeddings_for_documents(force_rebuild=True)
+        success = self.create_embeddings_for_documents(force_rebuild=True)
+        return self.create_lexical_index() and success
 
 
 def main():
@@ -1,17 +1,262 @@
 """Utility functions for the Tonkin Knowledge Finder."""
 
 import os
+import re
+import hashlib
 import platform
 import webbrowser
 import subprocess
+import threading
+import time
 import logging
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Pattern, Callable
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
 
+class LRUCache:
+    """Thread-safe, size-bounded least-recently-used cache with hit/miss counters."""
+    
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key, default=None):
+        """Return the cached value for key (marking it recently used), or default."""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key, value):
+        """Insert or refresh key, evicting the least recently used entry if full."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Remove all entries (counters are kept)."""
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit/miss/eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent calls into batched calls of ``fn(items) -> results``.
+    
+    The first caller to arrive becomes the batch leader: while other
+    callers are in flight it waits up to ``max_wait_ms`` for them to join
+    (or until ``max_batch_size`` items are pending), then runs ``fn`` once
+    for the whole batch and hands every caller its own result. A caller on
+    its own runs at once, without waiting. Callers block until their result
+    is ready, and an exception raised by ``fn`` is re-raised in every
+    caller of that batch.
+    """
+    
+    def __init__(self, fn: Callable[[List[Any]], List[Any]], max_batch_size: int = 32,
+                 max_wait_ms: float = 2.0):
+        self.fn = fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        lock = threading.Lock()
+        self._cond = threading.Condition(lock)  # Followers wait for their result or the lead
+        self._gather = threading.Condition(lock)  # The leader waits for its batch to fill
+        self._pending = []
+        self._has_leader = False
+        self._in_flight = 0  # Callers inside submit(), pending or in a running batch
+        self.batches = 0
+        self.items = 0
+    
+    def submit(self, item: Any) -> Any:
+        """Add one item to the next batch and return its result."""
+        with self._cond:
+            self._in_flight += 1
+        try:
+            return self._submit(item)
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._gather.notify()  # The leader may have no one left to wait for
+    
+    def _submit(self, item: Any) -> Any:
+        slot = {'item': item, 'done': False, 'lead': False, 'result': None, 'error': None}
+        with self._cond:
+            self._pending.append(slot)
+            if not self._has_leader:
+                self._has_leader = True
+                slot['lead'] = True
+            else:
+                self._gather.notify()  # The leader may now have a full batch
+            
+            while not slot['done'] and not slot['lead']:
+                self._cond.wait()
+            if slot['done']:
+                return self._result(slot)
+            
+            # Leader: the pending list starts with this slot; gather the batch
+            # while callers outside it are still in flight and may join
+            deadline = time.monotonic() + self.max_wait
+            while (len(self._pending) < self.max_batch_size
+                   and self._in_flight > len(self._pending)):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._gather.wait(remaining)
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            if self._pending:
+                self._pending[0]['lead'] = True  # Overflow starts the next batch
+            else:
+                self._has_leader = False
+            self._cond.notify_all()
+        
+        try:
+            results = self.fn([s['item'] for s in batch])
+            errors = [None] * len(batch)
+        except Exception as e:
+            results = [None] * len(batch)
+            errors = [e] * len(batch)
+        
+        with self._cond:
+            for batch_slot, result, error in zip(batch, results, errors):
+                batch_slot['result'] = result
+                batch_slot['error'] = error
+                batch_slot['done'] = True
+            self.batches += 1
+            self.items += len(batch)
+            self._cond.notify_all()
+        return self._result(slot)
+    
+    @staticmethod
+    def _result(slot: Dict[str, Any]) -> Any:
+        if slot['error'] is not None:
+            raise slot['error']
+        return slot['result']
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return batch counters and the mean batch size."""
+        with self._cond:
+            return {
+                'batches': self.batches,
+                'items': self.items,
+                'mean_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0
+            }
+
+
+def normalize_query(query: str) -> str:
+    """Normalise a search query for use as a cache key (case and whitespace)."""
+    return ' '.join(query.lower().split())
+
+
+@lru_cache(maxsize=256)
+def compile_query_matcher(query: str, min_length: int = 1, max_terms: int = None) -> Optional[Pattern]:
+    """
+    Compile one case-insensitive regex matching any query term.
+    
+    Terms shorter than ``min_length`` are skipped and at most ``max_terms``
+    are kept. Longer terms are tried first so that "stormwater" wins over
+    "storm". Each match's ``lastgroup`` ("t0", "t1", ...) names the term it
+    matched. Matchers are cached, so a query is compiled once however many
+    results it is applied to.
+    """
+    terms = list(dict.fromkeys(word.lower() for word in query.split() if len(word) >= min_length))
+    if max_terms is not None:
+        terms = terms[:max_terms]
+    if not terms:
+        return None
+    ordered = sorted(enumerate(terms), key=lambda item: len(item[1]), reverse=True)
+    return re.compile('|'.join(f'(?P<t{i}>{re.escape(term)})' for i, term in ordered), re.IGNORECASE)
+
+
+def extract_snippet(text: str, query: str, max_length: int = 200) -> str:
+    """
+    Return the max_length window of text containing the most distinct query terms.
+    
+    One regex pass collects match offsets and a two-pointer sweep over
+    them finds the best window, so the cost is linear in the text length.
+    The window is centred on its matches and trimmed to whole words.
+    """
+    if not text or len(text) <= max_length:
+        return text
+    
+    best_pos = 0
+    matcher = compile_query_matcher(query)
+    if matcher is not None:
+        # A match wider than the window fits in no window; keeping it would
+        # let the sweep's left pointer run past the right one
+        matches = [(m.start(), m.end(), m.lastgroup) for m in matcher.finditer(text)
+                   if m.end() - m.start() <= max_length]
+        counts = {}
+        best = (0, 0, 0)  # (distinct terms, first match, last match)
+        left = 0
+        for right, (_, end, term) in enumerate(matches):
+            counts[term] = counts.get(term, 0) + 1
+            while end - matches[left][0] > max_length:
+                left_term = matches[left][2]
+                counts[left_term] -= 1
+                if not counts[left_term]:
+                    del counts[left_term]
+                left += 1
+            if len(counts) > best[0]:
+                best = (len(counts), left, right)
+        
+        if best[0]:
+            span_start, span_end = matches[best[1]][0], matches[best[2]][1]
+            slack = (max_length - (span_end - span_start)) // 2
+            best_pos = max(0, min(span_start - slack, len(text) - max_length))
+    
+    snippet = text[best_pos:best_pos + max_length]
+    
+    # Clean up snippet boundaries (avoid cutting words)
+    if best_pos > 0 and not text[best_pos - 1].isspace():
+        space_idx = snippet.find(' ')
+        if space_idx > 0:
+            snippet = snippet[space_idx + 1:]
+    
+    if best_pos + max_length < len(text):
+        if not text[best_pos + max_length].isspace():
+            space_idx = snippet.rfind(' ')
+            if space_idx > 0:
+                snippet = snippet[:space_idx]
+        snippet = snippet.rstrip() + "..."
+    
+    return snippet.strip()
+
+
 def open_file(file_path: str) -> bool:
     """
     Open a file using the system's default application.
@@ -244,17 +489,11 @@ def highlight_query_terms(text: str, query: str, max_highlights: int = 3) -> str
     if not text or not query:
         return text
     
-    import re
-    
-    query_words = [word.lower() for word in query.split() if len(word) > 2]
-    highlighted_text = text
-    
-    for word in query_words[:max_highlights]:
-        # Case-insensitive highlighting
-        pattern = re.compile(re.escape(word), re.IGNORECASE)
-        highlighted_text = pattern.sub(f"**{word}**", highlighted_text)
-    
-    return highlighted_text
+    # One cached case-insensitive pass over the text for all terms
+    matcher = compile_query_matcher(query, min_length=3, max_terms=max_highlights)
+    if matcher is None:
+        return text
+    return matcher.sub(lambda match: f"**{match.group(0)}**", text)
 
 
 def validate_file_type(file_path: str, supported_extensions: List[str] = None) -> bool:
@@ -284,6 +523,15 @@ def get_file_metadata(file_path: str) -> Dict[str, Any]:
     }
 
 
+def compute_file_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Compute the SHA-256 hex digest of a file's contents, reading in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def sanitize_filename(filename: str) -> str:
     """Sanitize filename for safe storage."""
     import re
@@ -3,11 +3,17 @@
 
 import sys
 import os
+import subprocess
+import threading
+import time
 from pathlib import Path
 
 # Add src to path
 sys.path.append(str(Path(__file__).parent / "src"))
 
+# Seconds a fresh interpreter may spend on `import database`
+IMPORT_TIME_BUDGET = 0.5
+
 def test_imports():
     """Test that all modules can be imported."""
     print("🧪 Testing imports...")
@@ -115,6 +121,151 @@ def test_search_engine():
         print(f"❌ Search engine test failed: {e}")
         return False
 
+def test_import_time():
+    """Test that importing database stays fast and search defers heavy imports."""
+    print("\n⏱️ Testing import time...")
+    
+    # Fresh interpreter, so modules cached by earlier tests don't hide the cost
+    script = """
+import sys, time
+sys.path.append('src')
+start = time.perf_counter()
+import database
+elapsed = time.perf_counter() - start
+try:
+    import search
+except ImportError:
+    pass
+heavy = [m for m in ('torch', 'sentence_transformers', 'faiss') if m in sys.modules]
+print(elapsed, ','.join(heavy))
+"""
+    try:
+        output = subprocess.run([sys.executable, "-c", script], cwd=Path(__file__).parent,
+                                capture_output=True, text=True, check=True).stdout.split()
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Import time test failed: {e.stderr.strip()}")
+        return False
+    
+    elapsed = float(output[0])
+    heavy = output[1] if len(output) > 1 else ""
+    print(f"   import database: {elapsed * 1000:.0f} ms (budget {IMPORT_TIME_BUDGET * 1000:.0f} ms)")
+    
+    if elapsed > IMPORT_TIME_BUDGET:
+        print("❌ import database is over budget")
+        return False
+    if heavy:
+        print(f"❌ import search loaded {heavy} eagerly")
+        return False
+    
+    print("✅ Imports are fast and heavy dependencies are lazy")
+    return True
+
+def test_micro_batcher():
+    """Test that batched calls fan results out and propagate errors to every caller."""
+    print("\n📦 Testing query micro-batching...")
+    
+    try:
+        from utils import MicroBatcher
+        
+        # A caller on its own must not sit out the batching window
+        batcher = MicroBatcher(lambda items: [item * 2 for item in items], 8, max_wait_ms=1000)
+        started = time.perf_counter()
+        if batcher.submit(21) != 42 or time.perf_counter() - started > 0.5:
+            print("❌ A lone call waited for the batching window")
+            return False
+        
+        def run_concurrently(batcher, count):
+            outcomes = [None] * count
+            barrier = threading.Barrier(count)
+            def call(i):
+                barrier.wait()
+                try:
+                    outcomes[i] = batcher.submit(i)
+                except Exception as e:
+                    outcomes[i] = e
+            threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return outcomes
+        
+        # Calls arriving while a batch runs are gathered into the next one
+        def slow_double(items):
+            time.sleep(0.02)
+            return [item * 2 for item in items]
+        batcher = MicroBatcher(slow_double, 4, max_wait_ms=50)
+        outcomes = run_concurrently(batcher, 10)
+        if outcomes != [i * 2 for i in range(10)]:
+            print(f"❌ Batched callers got the wrong results: {outcomes}")
+            return False
+        if batcher.stats()['batches'] >= 10:
+            print("❌ Concurrent calls were not batched")
+            return False
+        
+        def fail(items):
+            raise ValueError("encoder failed")
+        outcomes = run_concurrently(MicroBatcher(fail, 4, max_wait_ms=50), 6)
+        if not all(isinstance(outcome, ValueError) for outcome in outcomes):
+            print(f"❌ A batch error did not reach every caller: {outcomes}")
+            return False
+        
+        print(f"✅ Micro-batching works ({batcher.stats()['mean_batch_size']} calls per batch)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Micro-batching test failed: {e}")
+        return False
+
+def test_offline_pipeline():
+    """Test index build, search and hydration with the offline hashed encoder."""
+    print("\n🔌 Testing offline search pipeline...")
+    
+    # Fresh interpreter: ENCODER_BACKEND is read when settings are imported
+    script = """
+import sys, tempfile
+from pathlib import Path
+sys.path.append('src')
+from database import KnowledgeDatabase
+from embedding_cache import EmbeddingCache
+from search import SemanticSearchEngine
+
+tmp = Path(tempfile.mkdtemp())
+db = KnowledgeDatabase(tmp / 'test.db')
+topics = ['stormwater drainage culvert', 'bridge deck girder', 'school classroom building']
+for i in range(30):
+    db.store_document({'file_path': f'/docs/{i}.pdf', 'file_name': f'{i}.pdf',
+                       'project_name': f'Project {i}', 'project_number': f'TKN-{i:03d}',
+                       'category': 'Water', 'trust_score': 0.5, 'trust_badges': [],
+                       'searchable_text': f'{topics[i % 3]} design report TKN-{i:03d}'})
+
+engine = SemanticSearchEngine(db=db)
+for name, value in list(vars(engine).items()):
+    if name.endswith('_file'):
+        setattr(engine, name, tmp / value.name)
+engine.embedding_cache = EmbeddingCache(tmp / 'cache.db')
+
+assert engine.model_name.startswith('hashed'), engine.model_name
+assert engine.create_embeddings_for_documents(force_rebuild=True)
+assert engine.create_lexical_index()
+results = engine.search('bridge girder', top_k=5, threshold=0.01)
+assert len(results) == 5, results
+assert all('bridge' in r['searchable_text'] for r in results), results
+assert all(r['project_name'] and 'similarity_score' in r for r in results), results
+assert engine.search('TKN-007', threshold=0.01)[0]['project_number'] == 'TKN-007'
+print(len(results))
+"""
+    env = dict(os.environ, ENCODER_BACKEND="hashed")
+    try:
+        output = subprocess.run([sys.executable, "-c", script], cwd=Path(__file__).parent, env=env,
+                                capture_output=True, text=True, check=True).stdout.split()
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Offline pipeline test failed: {e.stderr.strip()}")
+        return False
+    
+    print(f"✅ Built, searched and hydrated {output[-1]} results offline")
+    return True
+
 def check_dependencies():
     """Check if required dependencies are available."""
     print("\n📦 Checking dependencies...")
@@ -160,6 +311,10 @@ def main():
     if not test_imports():
         all_passed = False
     
+    # Test import time
+    if not test_import_time():
+        all_passed = False
+    
     # Test database
     if not test_database():
         all_passed = False
@@ -172,6 +327,14 @@ def main():
     if not test_search_engine():
         all_passed = False
     
+    # Test query micro-batching
+    if not test_micro_batcher():
+        all_passed = False
+    
+    # Test the full pipeline without network access
+    if not test_offline_pipeline():
+        all_passed = False
+    
     print("\n" + "="*50)
     if all_passed:
         print("🎉 All tests passed! System is ready.")